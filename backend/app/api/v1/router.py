@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from fastapi import APIRouter
 
-from app.api.v1.routes import health, auth, pairing, habits, checkins, feed
+from app.api.v1.routes import health, auth, pairing, habits, checkins, feed, stream, sync, stats, export, importing
 
 
 api_router = APIRouter()
@@ -13,3 +13,8 @@ api_router.include_router(pairing.router)
 api_router.include_router(habits.router)
 api_router.include_router(checkins.router)
 api_router.include_router(feed.router)
+api_router.include_router(stream.router)
+api_router.include_router(sync.router)
+api_router.include_router(stats.router)
+api_router.include_router(export.router)
+api_router.include_router(importing.router)
@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime, timezone
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import schemas
 from app.crud import (
@@ -12,13 +12,15 @@ from app.crud import (
     get_user_by_email,
     get_valid_refresh_token,
     revoke_refresh_token,
+    rotate_refresh_token,
+    update_user_password_hash,
 )
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.security import (
     create_access_token,
     create_refresh_token,
     decode_token,
-    verify_password,
+    verify_and_update_password,
 )
 from app.config import settings
 
@@ -26,35 +28,59 @@ from app.config import settings
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+def _new_refresh_token(user_id: int | str) -> tuple[str, datetime]:
+    refresh = create_refresh_token(user_id)
+    decoded = decode_token(refresh)
+    exp_ts = int(decoded["exp"])  # seconds since epoch
+    # Stored as naive UTC, like every other timestamp column
+    return refresh, datetime.fromtimestamp(exp_ts, tz=timezone.utc).replace(tzinfo=None)
+
+
 @router.post("/register", response_model=schemas.UserRead)
-def register(payload: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing = get_user_by_email(db, payload.email)
+async def register(
+    payload: schemas.UserCreate,
+    read_db: AsyncSession = Depends(get_read_db),
+    db: AsyncSession = Depends(get_db),
+):
+    # Only the final insert goes through the writer: with the SQLite profile it
+    # is a single connection, and create_user hashes the password before using it
+    existing = await get_user_by_email(read_db, payload.email)
+    await read_db.close()
     if existing:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
-    user = create_user(db, payload.email, payload.password, payload.display_name)
+    user = await create_user(db, payload.email, payload.password, payload.display_name)
     return user
 
 
 @router.post("/login", response_model=schemas.TokenPair)
-def login(payload: schemas.LoginRequest, db: Session = Depends(get_db)):
-    user = get_user_by_email(db, payload.email)
-    if not user or not verify_password(payload.password, user.hashed_password):
+async def login(
+    payload: schemas.LoginRequest,
+    read_db: AsyncSession = Depends(get_read_db),
+    db: AsyncSession = Depends(get_db),
+):
+    # Looked up on a read session that is closed before bcrypt runs, so the
+    # writer is only taken for the writes below
+    user = await get_user_by_email(read_db, payload.email)
+    await read_db.close()
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    verified, new_hash = await verify_and_update_password(payload.password, user.hashed_password)
+    if not verified:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        # Stored hash predates the current BCRYPT_ROUNDS setting
+        await update_user_password_hash(db, user, new_hash)
 
     access = create_access_token(user.id)
-    refresh = create_refresh_token(user.id)
-
-    decoded = decode_token(refresh)
-    exp_ts = int(decoded["exp"])  # seconds since epoch
-    expires_at = datetime.fromtimestamp(exp_ts, tz=timezone.utc)
-    db_create_refresh_token(db, user.id, refresh, expires_at)
+    refresh, expires_at = _new_refresh_token(user.id)
+    await db_create_refresh_token(db, user.id, refresh, expires_at)
 
     return schemas.TokenPair(access_token=access, refresh_token=refresh)
 
 
-@router.post("/refresh", response_model=schemas.AccessTokenResponse)
-def refresh_token(payload: schemas.TokenRefreshRequest, db: Session = Depends(get_db)):
-    stored = get_valid_refresh_token(db, payload.refresh_token)
+@router.post("/refresh", response_model=schemas.TokenPair)
+async def refresh_token(payload: schemas.TokenRefreshRequest, db: AsyncSession = Depends(get_db)):
+    stored = await get_valid_refresh_token(db, payload.refresh_token)
     if not stored:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
@@ -63,16 +89,20 @@ def refresh_token(payload: schemas.TokenRefreshRequest, db: Session = Depends(ge
         if decoded.get("typ") != "refresh":
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Wrong token type")
     except ValueError:
-        revoke_refresh_token(db, stored)
+        await revoke_refresh_token(db, payload.refresh_token)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Expired or invalid refresh token")
 
+    # Rotate: the presented refresh token is single-use. The lookup above is
+    # only a pre-check; the rotation itself revokes atomically, so a token
+    # presented twice concurrently yields one new pair, not two
+    refresh, expires_at = _new_refresh_token(decoded["sub"])
+    if await rotate_refresh_token(db, payload.refresh_token, refresh, expires_at) is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
     access = create_access_token(decoded["sub"])  # sub is user_id as str
-    return schemas.AccessTokenResponse(access_token=access)
+    return schemas.TokenPair(access_token=access, refresh_token=refresh)
 
 
 @router.post("/logout")
-def logout(payload: schemas.TokenRefreshRequest, db: Session = Depends(get_db)):
-    stored = get_valid_refresh_token(db, payload.refresh_token)
-    if stored:
-        revoke_refresh_token(db, stored)
+async def logout(payload: schemas.TokenRefreshRequest, db: AsyncSession = Depends(get_db)):
+    await revoke_refresh_token(db, payload.refresh_token)
     return {"ok": True}
@@ -2,29 +2,86 @@ from __future__ import annotations
 
 from datetime import date as date_cls
 
-from fastapi import APIRouter, Depends, File, Form, UploadFile
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import schemas
-from app.crud import get_user_pairs, list_checkins_for_date, upsert_checkin
-from app.database import get_db
-from app.deps import get_current_user
+from app.crud import list_checkins_for_date, list_habits, upsert_checkins
+from app.database import get_db, get_read_db
+from app.deps import get_current_pair_id, get_current_user
+from app.images import schedule_variants
 from app.models import User
+from app.serializers import ORJSONResponse, checkin_to_dict
 from app.utils import today_utc, save_upload
+from app.writer import write_checkin
 
 
 router = APIRouter(prefix="/checkins", tags=["checkins"])
 
 
-def _require_single_pair(db: Session, user_id: int) -> int:
-    pairs = get_user_pairs(db, user_id)
-    return pairs[0].id
+@router.get("/today", response_model=list[schemas.CheckinRead])
+async def today_checkins(pair_id: int = Depends(get_current_pair_id), db: AsyncSession = Depends(get_read_db)):
+    checkins = await list_checkins_for_date(db, pair_id, today_utc())
+    return ORJSONResponse([checkin_to_dict(ci) for ci in checkins])
 
 
-@router.get("/today", response_model=list[schemas.CheckinRead])
-def today_checkins(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    pair_id = _require_single_pair(db, current_user.id)
-    return list_checkins_for_date(db, pair_id, today_utc())
+# Declared before "/{habit_id}" so "batch" is not taken for a habit id
+@router.post("/batch", response_model=list[schemas.CheckinRead])
+async def submit_checkins_batch(
+    payload: str = Form(...),
+    images: list[UploadFile] = File(default=[]),
+    current_user: User = Depends(get_current_user),
+    pair_id: int = Depends(get_current_pair_id),
+    read_db: AsyncSession = Depends(get_read_db),
+    db: AsyncSession = Depends(get_db),
+):
+    """Submit several check-ins for one day in a single request and transaction.
+
+    ``payload`` is a JSON-encoded CheckinBatchRequest; an item refers to its
+    photo by position in the ``images`` parts via ``image_index``.
+    """
+    try:
+        batch = schemas.CheckinBatchRequest.model_validate_json(payload)
+    except ValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=exc.errors(include_url=False))
+
+    # Checked before any upload is stored; the read session is closed so the
+    # uploads below hold no connection
+    pair_habit_ids = {habit.id for habit in await list_habits(read_db, pair_id)}
+    await read_db.close()
+    unknown = sorted({item.habit_id for item in batch.items} - pair_habit_ids)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Habit not found: {', '.join(map(str, unknown))}"
+        )
+
+    values_by_habit: dict[int, dict] = {}
+    for item in batch.items:
+        image_url = None
+        if item.image_index is not None:
+            if not 0 <= item.image_index < len(images):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"No image part at index {item.image_index}")
+            image_url = await save_upload(images[item.image_index], subdir="checkins")
+            schedule_variants(image_url)
+        # A repeated habit_id overrides the earlier item, as separate requests would
+        values_by_habit[item.habit_id] = {
+            "value_bool": item.value_bool,
+            "value_number": item.value_number,
+            "value_text": item.value_text,
+            "value_time": item.value_time,
+            "note": item.note,
+            "image_path": image_url,
+        }
+
+    checkins = await upsert_checkins(
+        db,
+        pair_id=pair_id,
+        user_id=current_user.id,
+        date_value=batch.date or today_utc(),
+        values_by_habit=values_by_habit,
+    )
+    return [schemas.CheckinRead.model_validate(ci) for ci in checkins]
 
 
 @router.post("/{habit_id}", response_model=schemas.CheckinRead)
@@ -38,12 +95,13 @@ async def submit_checkin(
     image: UploadFile | None = File(default=None),
     date: str | None = Form(default=None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    pair_id: int = Depends(get_current_pair_id),
+    db: AsyncSession = Depends(get_db),
 ):
-    pair_id = _require_single_pair(db, current_user.id)
     image_url = None
     if image is not None:
         image_url = await save_upload(image, subdir="checkins")
+        schedule_variants(image_url)
 
     date_value = today_utc() if not date else date_cls.fromisoformat(date)
     values = {
@@ -54,7 +112,7 @@ async def submit_checkin(
         "note": note,
         "image_path": image_url,
     }
-    checkin = upsert_checkin(
+    checkin = await write_checkin(
         db,
         pair_id=pair_id,
         user_id=current_user.id,
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+from typing import AsyncIterator, Literal
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.crud import list_checkin_history_page, list_habits
+from app.database import ReadSessionLocal
+from app.deps import RequestContext, get_download_context
+from app.serializers import habit_to_dict
+from app.utils import today_utc
+
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+CSV_COLUMNS = (
+    "id",
+    "date",
+    "user_id",
+    "habit_id",
+    "habit_name",
+    "habit_type",
+    "value_bool",
+    "value_number",
+    "value_text",
+    "value_time",
+    "note",
+    "image_url",
+    "updated_at",
+)
+# NDJSON check-in lines carry the row without the denormalized habit columns
+_NDJSON_FIELDS = tuple(
+    (index, column) for index, column in enumerate(CSV_COLUMNS) if column not in ("habit_name", "habit_type")
+)
+_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+_PAGE_SIZE = 1000
+# However many downloads run, the rest of the read pool stays free for other requests
+_page_reads = asyncio.Semaphore(settings.export_read_concurrency)
+
+
+async def _read_page(pair_id: int, after) -> list:
+    async with _page_reads, ReadSessionLocal() as db:
+        return await list_checkin_history_page(db, pair_id, _PAGE_SIZE, after)
+
+
+async def _history_pages(pair_id: int) -> AsyncIterator[list]:
+    # The stream outlives the request's dependencies, and a slow client may take
+    # minutes to read it, so every page gets a short session of its own: no read
+    # connection is held while a chunk waits to be sent. A client disconnect
+    # cancels the stream; the shield lets a page in flight finish and return its
+    # connection instead of abandoning it half-closed.
+    after = None
+    while True:
+        rows = await asyncio.shield(_read_page(pair_id, after))
+        if rows:
+            yield rows
+        if len(rows) < _PAGE_SIZE:
+            return
+        after = (rows[-1].date, rows[-1].habit_id, rows[-1].user_id)
+
+
+async def _csv_chunks(pair_id: int) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    async for rows in _history_pages(pair_id):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header only: the pair has no check-ins
+        yield buffer.getvalue()
+
+
+async def _ndjson_chunks(pair_id: int) -> AsyncIterator[bytes]:
+    async with ReadSessionLocal() as db:
+        habits = await list_habits(db, pair_id)
+    # Habits first, so importers can resolve habit_id before the check-ins arrive
+    yield b"".join(orjson.dumps({"record": "habit", **habit_to_dict(h)}) + b"\n" for h in habits)
+    async for rows in _history_pages(pair_id):
+        yield b"".join(
+            orjson.dumps({"record": "checkin", **{column: row[index] for index, column in _NDJSON_FIELDS}}) + b"\n"
+            for row in rows
+        )
+
+
+@router.get("")
+async def export_history(
+    export_format: Literal["csv", "ndjson"] = Query(default="csv", alias="format"),
+    ctx: RequestContext = Depends(get_download_context),
+):
+    """The pair's whole history, streamed.
+
+    CSV has one row per check-in with its habit's name and type. NDJSON
+    has one ``{"record": "habit"}`` line per habit, then one
+    ``{"record": "checkin"}`` line per check-in.
+    """
+    if ctx.pair_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Please create or join a pair first")
+    chunks = _csv_chunks(ctx.pair_id) if export_format == "csv" else _ndjson_chunks(ctx.pair_id)
+    filename = f"heartsync-export-{today_utc().isoformat()}.{export_format}"
+    return StreamingResponse(
+        chunks,
+        media_type=_MEDIA_TYPES[export_format],
+        headers={"content-disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,72 +1,161 @@
 from __future__ import annotations
 
 from datetime import date as date_cls, timedelta
+from typing import Iterable, Literal, Optional
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import schemas
 from app.crud import (
     get_pair_member_user_ids,
-    get_user_pairs,
+    get_pair_version,
     list_checkins_for_date,
     list_habits,
     list_recent_checkins,
-    get_checkin_for_user_habit_date,
+    map_checkins_for_date,
 )
-from app.database import get_db
-from app.deps import get_current_user
-from app.models import User
-from app.utils import today_utc
+from app.database import get_read_db
+from app.deps import get_current_pair_id, get_current_user
+from app.images import variants_settled
+from app.models import DailyCheckin, User
+from app.response_cache import response_cache
+from app.serializers import ORJSONResponse, checkin_to_dict, compact_feed_to_dict, feed_to_dict, habit_to_dict
+from app.utils import decode_feed_cursor, encode_feed_cursor, etag_matches, pair_etag, today_utc
 
 
 router = APIRouter(prefix="/overview", tags=["overview"])
 
+# Accept header alternative to ?format=compact
+COMPACT_FEED_MEDIA_TYPE = "application/vnd.heartsync.feed.compact+json"
+# Clients may keep the body but must revalidate it on every poll
+_CACHE_CONTROL = "private, no-cache"
 
-def _require_single_pair(db: Session, user_id: int) -> int:
-    pairs = get_user_pairs(db, user_id)
-    return pairs[0].id
+
+def _not_modified(etag: str, **headers: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers={"etag": etag, "cache-control": _CACHE_CONTROL, **headers}
+    )
+
+
+def _with_etag(response: Response, etag: str, checkins: Iterable[DailyCheckin]) -> tuple[Response, bool]:
+    """Tag ``response`` unless it may still change at this version; returns it and whether it was tagged.
+
+    Image variants finish in the background without a version bump, so a
+    body still pointing at a pending variant is neither tagged nor cached.
+    """
+    response.headers["cache-control"] = _CACHE_CONTROL
+    settled = all(variants_settled(ci.image_path) for ci in checkins)
+    if settled:
+        response.headers["etag"] = etag
+    return response, settled
 
 
 @router.get("/today", response_model=schemas.TodayResponse)
-def today_overview(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    pair_id = _require_single_pair(db, current_user.id)
+async def today_overview(
+    current_user: User = Depends(get_current_user),
+    pair_id: int = Depends(get_current_pair_id),
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_read_db),
+):
     today = today_utc()
-    habits = list_habits(db, pair_id)
-    member_ids = get_pair_member_user_ids(db, pair_id)
-    partner_id = [uid for uid in member_ids if uid != current_user.id]
+    # Read before the data: a write landing in between only makes the body newer than its tag
+    etag = pair_etag(pair_id, await get_pair_version(db, pair_id), current_user.id, today)
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    return await response_cache.get_or_build(
+        pair_id, ("today", etag), lambda: _build_today(db, pair_id, current_user.id, today, etag)
+    )
+
+
+async def _build_today(
+    db: AsyncSession, pair_id: int, user_id: int, today: date_cls, etag: str
+) -> tuple[Response, bool]:
+    habits = await list_habits(db, pair_id)
+    member_ids = await get_pair_member_user_ids(db, pair_id)
+    partner_id = [uid for uid in member_ids if uid != user_id]
     partner_id = partner_id[0] if partner_id else None
 
-    tasks: list[schemas.TodayTask] = []
+    # One query for the whole day, independent of the number of habits
+    checkins = await map_checkins_for_date(db, pair_id, today)
+
+    tasks = []
     for habit in habits:
-        me_ci = get_checkin_for_user_habit_date(db, pair_id, current_user.id, habit.id, today)
-        partner_ci = get_checkin_for_user_habit_date(db, pair_id, partner_id, habit.id, today) if partner_id else None
+        me_ci = checkins.get((user_id, habit.id))
+        partner_ci = checkins.get((partner_id, habit.id)) if partner_id else None
         tasks.append(
-            schemas.TodayTask(
-                habit=habit,
-                me=me_ci and schemas.CheckinRead.model_validate(me_ci),
-                partner=partner_ci and schemas.CheckinRead.model_validate(partner_ci),
-            )
+            {
+                "habit": habit_to_dict(habit),
+                "me": me_ci and checkin_to_dict(me_ci),
+                "partner": partner_ci and checkin_to_dict(partner_ci),
+            }
         )
 
-    return schemas.TodayResponse(date=today, tasks=tasks)
+    # Serialized directly; the shape is schemas.TodayResponse
+    return _with_etag(ORJSONResponse({"date": today, "tasks": tasks}), etag, checkins.values())
 
 
 @router.get("/feed", response_model=schemas.FeedResponse)
-def feed_overview(days: int = 7, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    pair_id = _require_single_pair(db, current_user.id)
-    start_date = today_utc() - timedelta(days=days - 1)
-    recent = list_recent_checkins(db, pair_id, start_date)
-    # Build a simple feed grouped by date-habit-user
-    items: list[schemas.FeedItem] = []
-    habit_map = {h.id: h for h in list_habits(db, pair_id)}
-    for ci in recent:
-        items.append(
-            schemas.FeedItem(
-                date=ci.date,
-                habit=habit_map.get(ci.habit_id),
-                user_id=ci.user_id,
-                checkin=schemas.CheckinRead.model_validate(ci),
-            )
+async def feed_overview(
+    days: int = Query(default=7, ge=1, le=3650),
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: str | None = None,
+    feed_format: Optional[Literal["full", "compact"]] = Query(default=None, alias="format"),
+    accept: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None),
+    pair_id: int = Depends(get_current_pair_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Recent check-ins, newest first.
+
+    ``?format=compact`` (or ``Accept: application/vnd.heartsync.feed.compact+json``)
+    returns a CompactFeedResponse instead: each habit listed once and items
+    without null fields.
+    """
+    today = today_utc()
+    start_date = today - timedelta(days=days - 1)
+    try:
+        after = decode_feed_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if feed_format is None:
+        feed_format = "compact" if accept and COMPACT_FEED_MEDIA_TYPE in accept else "full"
+
+    etag = pair_etag(pair_id, await get_pair_version(db, pair_id), today, days, limit, cursor, feed_format)
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag, vary="Accept")
+    return await response_cache.get_or_build(
+        pair_id,
+        ("feed", etag),
+        lambda: _build_feed(db, pair_id, start_date, limit, after, feed_format, etag),
+    )
+
+
+async def _build_feed(
+    db: AsyncSession,
+    pair_id: int,
+    start_date: date_cls,
+    limit: int,
+    after: Optional[tuple],
+    feed_format: str,
+    etag: str,
+) -> tuple[Response, bool]:
+    # Fetch one extra row to know whether another page exists
+    recent = await list_recent_checkins(db, pair_id, start_date, limit=limit + 1, after=after)
+    page, has_more = recent[:limit], len(recent) > limit
+    habit_map = {h.id: h for h in await list_habits(db, pair_id)}
+    next_cursor = None
+    if has_more:
+        last = page[-1]
+        next_cursor = encode_feed_cursor(last.date, last.updated_at, last.id)
+    if feed_format == "compact":
+        response = ORJSONResponse(
+            compact_feed_to_dict(page, habit_map, next_cursor),
+            media_type=COMPACT_FEED_MEDIA_TYPE,
+            headers={"vary": "Accept"},
         )
-    return schemas.FeedResponse(items=items)
+    else:
+        # Serialized directly; the shape is schemas.FeedResponse
+        response = ORJSONResponse(feed_to_dict(page, habit_map, next_cursor), headers={"vary": "Accept"})
+    return _with_etag(response, etag, page)
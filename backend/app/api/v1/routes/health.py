@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from fastapi import APIRouter
 
+from app.response_cache import response_cache
+
 
 router = APIRouter()
 
@@ -9,3 +11,9 @@ router = APIRouter()
 @router.get("/health")
 def healthcheck() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@router.get("/health/cache")
+def cache_stats() -> dict:
+    """Response cache counters for this worker process."""
+    return response_cache.stats()
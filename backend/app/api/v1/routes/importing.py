@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.config import settings
+from app.database import get_db
+from app.deps import get_current_pair_id, get_current_user
+from app.importer import CheckinImporter, iter_csv_records, iter_ndjson_records
+from app.models import User
+
+
+router = APIRouter(prefix="/import", tags=["import"])
+
+
+def _detect_format(file: UploadFile) -> str:
+    filename = (file.filename or "").lower()
+    if filename.endswith((".ndjson", ".jsonl")) or (file.content_type or "").endswith("ndjson"):
+        return "ndjson"
+    return "csv"
+
+
+@router.post("", response_model=schemas.ImportResult)
+async def import_checkins(
+    file: UploadFile = File(...),
+    import_format: Optional[Literal["csv", "ndjson"]] = Form(default=None, alias="format"),
+    current_user: User = Depends(get_current_user),
+    pair_id: int = Depends(get_current_pair_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """Import the caller's check-ins from a CSV or NDJSON file, e.g. one produced by GET /export.
+
+    Habits are matched by name and created when missing. Rows are written in
+    batches of IMPORT_BATCH_SIZE, one transaction each; invalid rows are
+    skipped and reported by line number. Rows with another member's
+    ``user_id`` are left out and counted in ``skipped``. Request bodies over
+    IMPORT_MAX_BYTES are refused while they arrive (BodySizeLimitMiddleware).
+    """
+    import_format = import_format or _detect_format(file)
+    records = iter_csv_records(file.file) if import_format == "csv" else iter_ndjson_records(file.file)
+    importer = CheckinImporter(db, pair_id, current_user.id, batch_size=settings.import_batch_size)
+    try:
+        return await importer.run(records)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File must be UTF-8 encoded")
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import base64
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.crud import get_pair_member_user_ids
+from app.database import get_read_db
+from app.deps import get_current_pair_id
+from app.models import Habit
+from app.serializers import ORJSONResponse
+from app.stats import completion_bitsets, days_in_year, list_pair_stats, summarize
+from app.utils import today_utc
+
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+
+@router.get("", response_model=list[schemas.HabitStatsRead])
+async def pair_stats(pair_id: int = Depends(get_current_pair_id), db: AsyncSession = Depends(get_read_db)):
+    """Streaks and completion rates per habit and member, read from habit_stats in O(habits)."""
+    today = today_utc()
+    return ORJSONResponse([summarize(stats, today) for stats in await list_pair_stats(db, pair_id)])
+
+
+@router.get("/heatmap", response_model=schemas.HeatmapResponse)
+async def heatmap(
+    habit_id: int,
+    year: Optional[int] = Query(default=None, ge=1970, le=9999),
+    pair_id: int = Depends(get_current_pair_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Completion calendar of one habit for every member, one base64 bitset per member.
+
+    Decode with: ``completed(i) = bytes[i >> 3] & (1 << (i & 7))``, i = day of year - 1.
+    """
+    habit = await db.get(Habit, habit_id)
+    if habit is None or habit.pair_id != pair_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Habit not found")
+    year = year or today_utc().year
+    user_ids = await get_pair_member_user_ids(db, pair_id)
+    bitsets = await completion_bitsets(db, habit_id, user_ids, year)
+    # Serialized directly; the shape is schemas.HeatmapResponse
+    return ORJSONResponse(
+        {
+            "habit_id": habit_id,
+            "year": year,
+            "days": days_in_year(year),
+            "users": [
+                {
+                    "user_id": user_id,
+                    "bitmap": base64.b64encode(bitset).decode(),
+                    "completed": sum(bin(byte).count("1") for byte in bitset),
+                }
+                for user_id, bitset in bitsets.items()
+            ],
+        }
+    )
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app import schemas
+from app.config import settings
+from app.deps import RequestContext, get_current_user, get_stream_context
+from app.events import event_broker
+from app.models import User
+from app.security import create_stream_token
+
+
+router = APIRouter(tags=["stream"])
+
+
+async def _event_source(pair_id: int, heartbeat: float, max_seconds: float) -> AsyncIterator[str]:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_seconds
+    async with event_broker.subscribe(pair_id) as queue:
+        # Reconnect delay for EventSource, in milliseconds
+        yield "retry: 3000\n\n"
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                # Ending is routine: the client reconnects, and no stream outlives a graceful shutdown for long
+                return
+            try:
+                data: Optional[str] = await asyncio.wait_for(queue.get(), min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                # Comment line; keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            if data is None:
+                return
+            yield f"data: {data}\n\n"
+
+
+@router.post("/stream/token", response_model=schemas.StreamToken)
+async def stream_token(current_user: User = Depends(get_current_user)):
+    """A short-lived token for ``GET /stream?token=``, which EventSource needs since it cannot send headers."""
+    return schemas.StreamToken(token=create_stream_token(current_user.id), expires_in=settings.event_stream_token_seconds)
+
+
+@router.get("/stream")
+async def event_stream(ctx: RequestContext = Depends(get_stream_context)):
+    """Server-sent events for the caller's pair.
+
+    Each message is a JSON object with a ``type``: ``checkins``, ``habit.created``,
+    ``habit.updated``, ``habit.deleted``, ``pair.member_joined`` or ``resync``
+    (events were missed; refetch the overview). The stream ends after
+    EVENT_STREAM_MAX_SECONDS or on server shutdown; clients reconnect.
+    """
+    if ctx.pair_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Please create or join a pair first")
+    return StreamingResponse(
+        _event_source(ctx.pair_id, settings.event_stream_heartbeat_seconds, settings.event_stream_max_seconds),
+        media_type="text/event-stream",
+        headers={"cache-control": "no-cache", "x-accel-buffering": "no"},
+    )
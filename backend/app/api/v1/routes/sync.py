@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.config import settings
+from app.crud import (
+    get_pair_version,
+    list_checkins_changed_since,
+    list_deleted_habit_ids,
+    list_habits,
+    list_habits_changed_since,
+)
+from app.database import get_read_db
+from app.deps import get_current_pair_id
+from app.serializers import ORJSONResponse, checkin_to_dict, habit_to_dict
+from app.utils import decode_sync_token, encode_sync_token
+
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+@router.get("", response_model=schemas.SyncResponse)
+async def delta_sync(
+    since: Optional[str] = None,
+    pair_id: int = Depends(get_current_pair_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Habits and check-ins changed since ``since``, and the token to pass next time.
+
+    Without a token, or with one older than the tombstone retention, the
+    response is a full snapshot (``full``). Rows changed shortly before the
+    token may be sent again; clients upsert by id.
+    """
+    now = datetime.utcnow()
+    try:
+        token = decode_sync_token(since) if since else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token")
+
+    # Read before the data, like the overview ETags: a write landing in between is sent again next time
+    version = await get_pair_version(db, pair_id)
+    full = token is None or token[1] < now - timedelta(days=settings.sync_tombstone_retention_days)
+    if not full and token[0] == version:
+        # Nothing was written since the token was issued
+        return ORJSONResponse({"full": False, "habits": [], "checkins": [], "deleted_habit_ids": [], "token": since})
+
+    changed_since = None if full else token[1]
+    if changed_since is None:
+        habits = await list_habits(db, pair_id)
+        deleted_habit_ids = []
+    else:
+        habits = await list_habits_changed_since(db, pair_id, changed_since)
+        deleted_habit_ids = await list_deleted_habit_ids(db, pair_id, changed_since)
+    checkins = await list_checkins_changed_since(db, pair_id, changed_since)
+
+    # Serialized directly; the shape is schemas.SyncResponse
+    return ORJSONResponse(
+        {
+            "full": full,
+            "habits": [habit_to_dict(h) for h in habits],
+            "checkins": [checkin_to_dict(ci) for ci in checkins],
+            "deleted_habit_ids": deleted_habit_ids,
+            "token": encode_sync_token(version, now - timedelta(seconds=settings.sync_overlap_seconds)),
+        }
+    )
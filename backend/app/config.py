@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -20,10 +20,76 @@ class Settings(BaseSettings):
     algorithm: str = Field(default="HS256", alias="ALGORITHM")
     access_token_expire_minutes: int = Field(default=30, alias="ACCESS_TOKEN_EXPIRE_MINUTES")
     refresh_token_expire_days: int = Field(default=30, alias="REFRESH_TOKEN_EXPIRE_DAYS")
+    refresh_token_purge_interval_seconds: int = Field(default=3600, alias="REFRESH_TOKEN_PURGE_INTERVAL_SECONDS")
+    refresh_token_purge_batch_size: int = Field(default=1000, alias="REFRESH_TOKEN_PURGE_BATCH_SIZE")
+
+    # Password hashing (bcrypt runs in its own bounded thread pool)
+    bcrypt_rounds: int = Field(default=12, alias="BCRYPT_ROUNDS")
+    password_hash_workers: int = Field(default=2, alias="PASSWORD_HASH_WORKERS")
+    password_hash_queue_size: int = Field(default=32, alias="PASSWORD_HASH_QUEUE_SIZE")
 
     # Database
     database_url: str = Field(default="sqlite:///./data/app.db", alias="DATABASE_URL")
 
+    # SQLite storage profile: WAL + tuned pragmas, separate read pool, single writer connection
+    sqlite_production_profile: bool = Field(default=True, alias="SQLITE_PRODUCTION_PROFILE")
+    sqlite_busy_timeout_ms: int = Field(default=5000, alias="SQLITE_BUSY_TIMEOUT_MS")
+    sqlite_mmap_size: int = Field(default=256 * 1024 * 1024, alias="SQLITE_MMAP_SIZE")
+    sqlite_cache_size_kib: int = Field(default=64 * 1024, alias="SQLITE_CACHE_SIZE_KIB")
+    sqlite_read_pool_size: int = Field(default=8, alias="SQLITE_READ_POOL_SIZE")
+
+    # Opt-in group commit for single check-in submissions
+    checkin_write_coalescing: bool = Field(default=False, alias="CHECKIN_WRITE_COALESCING")
+    checkin_write_batch_size: int = Field(default=100, alias="CHECKIN_WRITE_BATCH_SIZE")
+    checkin_write_max_delay_ms: float = Field(default=5, alias="CHECKIN_WRITE_MAX_DELAY_MS")
+
+    # Uploads
+    max_upload_bytes: int = Field(default=10 * 1024 * 1024, alias="MAX_UPLOAD_BYTES")
+    # Whole request bodies, enforced while they arrive; a check-in batch may carry several images
+    max_request_bytes: int = Field(default=50 * 1024 * 1024, alias="MAX_REQUEST_BYTES")
+    image_variant_workers: int = Field(default=2, alias="IMAGE_VARIANT_WORKERS")
+    upload_gc_interval_seconds: int = Field(default=3600, alias="UPLOAD_GC_INTERVAL_SECONDS")
+    upload_gc_batch_size: int = Field(default=500, alias="UPLOAD_GC_BATCH_SIZE")
+    # Files younger than this are never collected, so uploads whose check-in is not committed yet survive
+    upload_gc_grace_seconds: int = Field(default=3600, alias="UPLOAD_GC_GRACE_SECONDS")
+
+    # Per-process cache of authenticated user + pair membership
+    request_context_cache_size: int = Field(default=10000, alias="REQUEST_CONTEXT_CACHE_SIZE")
+    request_context_cache_ttl_seconds: int = Field(default=60, alias="REQUEST_CONTEXT_CACHE_TTL_SECONDS")
+
+    # Bulk import (POST /import): rows per upsert statement and transaction
+    import_batch_size: int = Field(default=1000, alias="IMPORT_BATCH_SIZE")
+    import_max_bytes: int = Field(default=100 * 1024 * 1024, alias="IMPORT_MAX_BYTES")
+
+    # History export (GET /export): read connections all downloads together may use at once
+    export_read_concurrency: int = Field(default=2, alias="EXPORT_READ_CONCURRENCY")
+
+    # Delta sync: tokens older than the tombstone retention fall back to a full sync
+    sync_tombstone_retention_days: int = Field(default=90, alias="SYNC_TOMBSTONE_RETENTION_DAYS")
+    sync_tombstone_purge_interval_seconds: int = Field(default=86400, alias="SYNC_TOMBSTONE_PURGE_INTERVAL_SECONDS")
+    sync_tombstone_purge_batch_size: int = Field(default=1000, alias="SYNC_TOMBSTONE_PURGE_BATCH_SIZE")
+    # Rows are matched from this long before the token's time, covering writes committed late
+    sync_overlap_seconds: int = Field(default=60, alias="SYNC_OVERLAP_SECONDS")
+
+    # Real-time events for /stream; empty = in-process only, redis://... shares them between workers
+    event_backend_url: str = Field(default="", alias="EVENT_BACKEND_URL")
+    event_stream_heartbeat_seconds: float = Field(default=15, alias="EVENT_STREAM_HEARTBEAT_SECONDS")
+    event_stream_queue_size: int = Field(default=100, alias="EVENT_STREAM_QUEUE_SIZE")
+    # Streams are ended after this long and the client reconnects, so none outlives a graceful shutdown by more
+    event_stream_max_seconds: float = Field(default=600, alias="EVENT_STREAM_MAX_SECONDS")
+    # Lifetime of the single-purpose ?token= for opening a stream (POST /stream/token)
+    event_stream_token_seconds: int = Field(default=60, alias="EVENT_STREAM_TOKEN_SECONDS")
+
+    # Rendered GET responses (overview, feed, habits); empty URL = per-process LRU, redis://... = shared
+    response_cache_enabled: bool = Field(default=True, alias="RESPONSE_CACHE_ENABLED")
+    response_cache_url: str = Field(default="", alias="RESPONSE_CACHE_URL")
+    response_cache_max_entries: int = Field(default=5000, alias="RESPONSE_CACHE_MAX_ENTRIES")
+    response_cache_max_bytes: int = Field(default=64 * 1024 * 1024, alias="RESPONSE_CACHE_MAX_BYTES")
+    response_cache_ttl_seconds: float = Field(default=600, alias="RESPONSE_CACHE_TTL_SECONDS")
+
+    # Built Vue app served at "/" when present; defaults to ../frontend/dist
+    frontend_dist: Optional[Path] = Field(default=None, alias="FRONTEND_DIST_DIR")
+
     # CORS
     cors_origins: List[str] = Field(default_factory=lambda: ["*"], alias="CORS_ORIGINS")
 
@@ -45,5 +111,9 @@ class Settings(BaseSettings):
     def static_dir(self) -> Path:
         return self.app_dir / "static"
 
+    @property
+    def frontend_dist_dir(self) -> Path:
+        return self.frontend_dist or self.project_dir.parent / "frontend" / "dist"
+
 
 settings = Settings()
@@ -1,172 +1,330 @@
 from __future__ import annotations
 
 from datetime import datetime, date
-from typing import Optional, List
-
-from sqlalchemy import select, and_
-from sqlalchemy.orm import Session
-
-from app.models import RefreshToken, User, Pair, PairMember, Habit, DailyCheckin
-from app.security import hash_password
+from typing import Dict, Optional, List, Tuple
+
+from sqlalchemy import delete, or_, select, and_, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import request_context_cache
+from app.database import dialect_insert
+from app.events import event_broker, publish_checkins, publish_habit
+from app.response_cache import response_cache
+from app.models import RefreshToken, User, Pair, PairMember, Habit, DailyCheckin, Tombstone
+from app.security import hash_password, hash_token
+from app.stats import apply_checkins as apply_checkins_to_stats
 from app.utils import generate_pair_code
 
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
-    return db.execute(select(User).where(User.email == email)).scalar_one_or_none()
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    return (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
 
 
-def create_user(db: Session, email: str, password: str, display_name: Optional[str]) -> User:
-    user = User(email=email, hashed_password=hash_password(password), display_name=display_name)
+async def create_user(db: AsyncSession, email: str, password: str, display_name: Optional[str]) -> User:
+    user = User(email=email, hashed_password=await hash_password(password), display_name=display_name)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
-def create_refresh_token(db: Session, user_id: int, token: str, expires_at: datetime) -> RefreshToken:
-    rt = RefreshToken(user_id=user_id, token=token, expires_at=expires_at)
+async def update_user_password_hash(db: AsyncSession, user: User, hashed_password: str) -> None:
+    user.hashed_password = hashed_password
+    db.add(user)
+    await db.commit()
+
+
+async def create_refresh_token(db: AsyncSession, user_id: int, token: str, expires_at: datetime) -> RefreshToken:
+    rt = RefreshToken(user_id=user_id, token_hash=hash_token(token), expires_at=expires_at)
     db.add(rt)
-    db.commit()
-    db.refresh(rt)
+    await db.commit()
+    await db.refresh(rt)
     return rt
 
 
-def get_valid_refresh_token(db: Session, token: str) -> Optional[RefreshToken]:
-    return db.execute(
-        select(RefreshToken).where(RefreshToken.token == token, RefreshToken.revoked == False)  # noqa: E712
-    ).scalar_one_or_none()
+async def get_valid_refresh_token(db: AsyncSession, token: str) -> Optional[RefreshToken]:
+    return (await db.execute(
+        select(RefreshToken).where(
+            RefreshToken.token_hash == hash_token(token),
+            RefreshToken.revoked == False,  # noqa: E712
+            RefreshToken.expires_at > datetime.utcnow(),
+        )
+    )).scalar_one_or_none()
+
+
+def _claim_refresh_token_stmt(token: str):
+    # Conditional UPDATE ... RETURNING: of concurrent claims on one token,
+    # only the first gets its user_id back
+    return (
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == hash_token(token),
+            RefreshToken.revoked == False,  # noqa: E712
+            RefreshToken.expires_at > datetime.utcnow(),
+        )
+        .values(revoked=True)
+        .returning(RefreshToken.user_id)
+    )
+
+
+async def revoke_refresh_token(db: AsyncSession, token: str) -> None:
+    await db.execute(_claim_refresh_token_stmt(token))
+    await db.commit()
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str, new_token: str, expires_at: datetime) -> Optional[RefreshToken]:
+    """Revoke ``token`` and store ``new_token`` in the same transaction.
+
+    Returns None, storing nothing, when ``token`` is no longer valid, e.g.
+    because a concurrent refresh already rotated it.
+    """
+    user_id = (await db.execute(_claim_refresh_token_stmt(token))).scalar_one_or_none()
+    if user_id is None:
+        await db.rollback()
+        return None
+    rt = RefreshToken(user_id=user_id, token_hash=hash_token(new_token), expires_at=expires_at)
+    db.add(rt)
+    await db.commit()
+    return rt
 
 
-def revoke_refresh_token(db: Session, token: RefreshToken) -> None:
-    token.revoked = True
-    db.add(token)
-    db.commit()
+async def purge_refresh_tokens(db: AsyncSession, batch_size: int) -> int:
+    """Delete expired or revoked refresh tokens in batches; returns the number removed."""
+    removed = 0
+    while True:
+        ids = (await db.execute(
+            select(RefreshToken.id)
+            .where(or_(RefreshToken.revoked == True, RefreshToken.expires_at <= datetime.utcnow()))  # noqa: E712
+            .limit(batch_size)
+        )).scalars().all()
+        if not ids:
+            return removed
+        await db.execute(delete(RefreshToken).where(RefreshToken.id.in_(ids)))
+        await db.commit()
+        removed += len(ids)
+        if len(ids) < batch_size:
+            return removed
+
+
+async def purge_tombstones(db: AsyncSession, older_than: datetime, batch_size: int) -> int:
+    """Delete tombstones older than ``older_than`` in batches; returns the number removed."""
+    removed = 0
+    while True:
+        ids = (await db.execute(
+            select(Tombstone.id).where(Tombstone.deleted_at < older_than).limit(batch_size)
+        )).scalars().all()
+        if not ids:
+            return removed
+        await db.execute(delete(Tombstone).where(Tombstone.id.in_(ids)))
+        await db.commit()
+        removed += len(ids)
+        if len(ids) < batch_size:
+            return removed
 
 
 # Pairing
-def create_pair(db: Session, owner_user_id: int) -> Pair:
+async def create_pair(db: AsyncSession, owner_user_id: int) -> Pair:
     pair = Pair(code=generate_pair_code())
     db.add(pair)
-    db.flush()
+    await db.flush()
     db.add(PairMember(pair_id=pair.id, user_id=owner_user_id))
-    db.commit()
-    db.refresh(pair)
+    await db.commit()
+    await db.refresh(pair)
+    request_context_cache.invalidate(owner_user_id)
     return pair
 
 
-def get_pair_by_code(db: Session, code: str) -> Optional[Pair]:
-    return db.execute(select(Pair).where(Pair.code == code)).scalar_one_or_none()
+async def get_pair_by_code(db: AsyncSession, code: str) -> Optional[Pair]:
+    return (await db.execute(select(Pair).where(Pair.code == code))).scalar_one_or_none()
 
 
-def join_pair(db: Session, pair: Pair, user_id: int) -> None:
-    existing = db.execute(
+async def join_pair(db: AsyncSession, pair: Pair, user_id: int) -> None:
+    existing = (await db.execute(
         select(PairMember).where(PairMember.pair_id == pair.id, PairMember.user_id == user_id)
-    ).scalar_one_or_none()
+    )).scalar_one_or_none()
     if existing:
         return
     db.add(PairMember(pair_id=pair.id, user_id=user_id))
-    db.commit()
+    await bump_pair_version(db, pair.id)
+    await db.commit()
+    request_context_cache.invalidate(user_id)
+    await event_broker.publish(pair.id, "pair.member_joined", user_id=user_id)
 
 
-def get_user_pairs(db: Session, user_id: int) -> List[Pair]:
-    pairs = db.execute(
+async def bump_pair_version(db: AsyncSession, *pair_ids: int) -> None:
+    """Advance the pairs' version in the caller's transaction.
+
+    Committing together with the write keeps the version from ever running
+    behind the data it describes.
+    """
+    await db.execute(
+        update(Pair).where(Pair.id.in_(pair_ids)).values(version=Pair.version + 1),
+        execution_options={"synchronize_session": False},
+    )
+    # Entries are keyed by version and cannot be served again anyway; this frees them now
+    await response_cache.invalidate_pair(*pair_ids)
+
+
+async def get_pair_version(db: AsyncSession, pair_id: int) -> int:
+    return (await db.execute(select(Pair.version).where(Pair.id == pair_id))).scalar_one_or_none() or 0
+
+
+async def get_user_pairs(db: AsyncSession, user_id: int) -> List[Pair]:
+    pairs = (await db.execute(
         select(Pair).join(PairMember, PairMember.pair_id == Pair.id).where(PairMember.user_id == user_id)
-    ).scalars().all()
+    )).scalars().all()
     return pairs
 
 
-def get_pair_member_user_ids(db: Session, pair_id: int) -> List[int]:
-    return db.execute(select(PairMember.user_id).where(PairMember.pair_id == pair_id)).scalars().all()
+async def get_pair_member_user_ids(db: AsyncSession, pair_id: int) -> List[int]:
+    return (await db.execute(select(PairMember.user_id).where(PairMember.pair_id == pair_id))).scalars().all()
 
 
-def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
-    return db.get(User, user_id)
+async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
+    return await db.get(User, user_id)
 
 
 # Habits
-def list_habits(db: Session, pair_id: int) -> List[Habit]:
-    return db.execute(select(Habit).where(Habit.pair_id == pair_id).order_by(Habit.order_index)).scalars().all()
+async def list_habits(db: AsyncSession, pair_id: int) -> List[Habit]:
+    return (await db.execute(select(Habit).where(Habit.pair_id == pair_id).order_by(Habit.order_index))).scalars().all()
 
 
-def create_habit(db: Session, pair_id: int, name: str, type_: str, is_active: bool, order_index: int) -> Habit:
+async def create_habit(db: AsyncSession, pair_id: int, name: str, type_: str, is_active: bool, order_index: int) -> Habit:
     habit = Habit(pair_id=pair_id, name=name, type=type_, is_active=is_active, order_index=order_index)
     db.add(habit)
-    db.commit()
-    db.refresh(habit)
+    await bump_pair_version(db, pair_id)
+    await db.commit()
+    await db.refresh(habit)
+    await publish_habit("habit.created", habit)
     return habit
 
 
-def update_habit(db: Session, habit_id: int, **fields) -> Optional[Habit]:
-    habit = db.get(Habit, habit_id)
+async def update_habit(db: AsyncSession, habit_id: int, **fields) -> Optional[Habit]:
+    habit = await db.get(Habit, habit_id)
     if not habit:
         return None
     for k, v in fields.items():
         if v is not None:
             setattr(habit, k, v)
     db.add(habit)
-    db.commit()
-    db.refresh(habit)
+    await bump_pair_version(db, habit.pair_id)
+    await db.commit()
+    await db.refresh(habit)
+    await publish_habit("habit.updated", habit)
     return habit
 
 
-def delete_habit(db: Session, habit_id: int) -> None:
-    habit = db.get(Habit, habit_id)
+async def delete_habit(db: AsyncSession, habit_id: int) -> None:
+    habit = await db.get(Habit, habit_id)
     if habit:
-        db.delete(habit)
-        db.commit()
+        await db.delete(habit)
+        db.add(Tombstone(pair_id=habit.pair_id, entity="habit", entity_id=habit.id))
+        await bump_pair_version(db, habit.pair_id)
+        await db.commit()
+        await publish_habit("habit.deleted", habit)
 
 
 # Check-ins
-def upsert_checkin(
-    db: Session,
+
+
+def _checkin_upsert_stmt(db: AsyncSession, rows: List[dict]):
+    """INSERT ... ON CONFLICT (user_id, habit_id, date) DO UPDATE ... RETURNING for the keys of ``rows``.
+
+    The rows themselves are passed as parameters when executing, so the
+    statement compiles once per shape and SQLAlchemy batches them into
+    multi-row VALUES. All rows must carry the same keys; on conflict every
+    non-key column is overwritten with the incoming (``excluded``) value.
+    """
+    stmt = dialect_insert(db)(DailyCheckin)
+    conflict_keys = ("user_id", "habit_id", "date")
+    updates = {k: stmt.excluded[k] for k in rows[0] if k not in conflict_keys}
+    return stmt.on_conflict_do_update(index_elements=list(conflict_keys), set_=updates).returning(DailyCheckin)
+
+
+def checkin_row(
+    pair_id: int, user_id: int, habit_id: int, date_value: date, values: dict, now: Optional[datetime] = None
+) -> dict:
+    """Column values for one check-in upsert, as consumed by upsert_checkin_rows."""
+    # onupdate hooks do not fire for ON CONFLICT, so updated_at is always set explicitly
+    return {
+        "pair_id": pair_id,
+        "user_id": user_id,
+        "habit_id": habit_id,
+        "date": date_value,
+        **values,
+        "updated_at": now or datetime.utcnow(),
+    }
+
+
+async def upsert_checkin_rows(db: AsyncSession, rows: List[dict]) -> List[DailyCheckin]:
+    """Upsert prepared rows in one statement and one commit.
+
+    Rows must share the same keys and be unique on (user_id, habit_id, date);
+    the returned check-ins are in no particular order.
+    """
+    if not rows:
+        return []
+    stmt = _checkin_upsert_stmt(db, rows)
+    checkins = (await db.execute(stmt, rows, execution_options={"populate_existing": True})).scalars().all()
+    await apply_checkins_to_stats(db, checkins)
+    await bump_pair_version(db, *{row["pair_id"] for row in rows})
+    await db.commit()
+    await publish_checkins(checkins)
+    return checkins
+
+
+async def upsert_checkin(
+    db: AsyncSession,
     pair_id: int,
     user_id: int,
     habit_id: int,
     date_value: date,
     values: dict,
 ) -> DailyCheckin:
-    existing = db.execute(
-        select(DailyCheckin).where(
-            and_(
-                DailyCheckin.pair_id == pair_id,
-                DailyCheckin.user_id == user_id,
-                DailyCheckin.habit_id == habit_id,
-                DailyCheckin.date == date_value,
-            )
-        )
-    ).scalar_one_or_none()
+    """Insert or overwrite a check-in with a single INSERT ... ON CONFLICT ... RETURNING.
 
-    if existing:
-        for k, v in values.items():
-            setattr(existing, k, v)
-        db.add(existing)
-        db.commit()
-        db.refresh(existing)
-        return existing
-
-    checkin = DailyCheckin(
-        pair_id=pair_id,
-        user_id=user_id,
-        habit_id=habit_id,
-        date=date_value,
-        **values,
-    )
-    db.add(checkin)
-    db.commit()
-    db.refresh(checkin)
-    return checkin
+    Conflicts are resolved on ``uq_user_habit_date`` by the database itself, so
+    two concurrent submissions cannot race each other into an IntegrityError.
+    """
+    checkins = await upsert_checkin_rows(db, [checkin_row(pair_id, user_id, habit_id, date_value, values)])
+    return checkins[0]
+
+
+async def upsert_checkins(
+    db: AsyncSession,
+    pair_id: int,
+    user_id: int,
+    date_value: date,
+    values_by_habit: Dict[int, dict],
+) -> List[DailyCheckin]:
+    """Upsert one check-in per habit for a single day in one statement and one commit."""
+    now = datetime.utcnow()
+    rows = [checkin_row(pair_id, user_id, habit_id, date_value, values, now) for habit_id, values in values_by_habit.items()]
+    return await upsert_checkin_rows(db, rows)
 
 
-def list_checkins_for_date(db: Session, pair_id: int, date_value: date) -> List[DailyCheckin]:
-    return db.execute(
+async def list_checkins_for_date(db: AsyncSession, pair_id: int, date_value: date) -> List[DailyCheckin]:
+    return (await db.execute(
         select(DailyCheckin).where(DailyCheckin.pair_id == pair_id, DailyCheckin.date == date_value)
-    ).scalars().all()
+    )).scalars().all()
 
 
-def get_checkin_for_user_habit_date(
-    db: Session, pair_id: int, user_id: int, habit_id: int, date_value: date
+async def referenced_image_paths(db: AsyncSession, paths: List[str]) -> set[str]:
+    """The subset of ``paths`` still stored in some check-in's image_path."""
+    if not paths:
+        return set()
+    return set((await db.execute(select(DailyCheckin.image_path).where(DailyCheckin.image_path.in_(paths)))).scalars())
+
+
+async def map_checkins_for_date(db: AsyncSession, pair_id: int, date_value: date) -> Dict[Tuple[int, int], DailyCheckin]:
+    """All check-ins of a pair for one day in a single query, keyed by (user_id, habit_id)."""
+    return {(ci.user_id, ci.habit_id): ci for ci in await list_checkins_for_date(db, pair_id, date_value)}
+
+
+async def get_checkin_for_user_habit_date(
+    db: AsyncSession, pair_id: int, user_id: int, habit_id: int, date_value: date
 ) -> Optional[DailyCheckin]:
-    return db.execute(
+    return (await db.execute(
         select(DailyCheckin).where(
             and_(
                 DailyCheckin.pair_id == pair_id,
@@ -175,12 +333,86 @@ def get_checkin_for_user_habit_date(
                 DailyCheckin.date == date_value,
             )
         )
-    ).scalar_one_or_none()
+    )).scalar_one_or_none()
 
 
-def list_recent_checkins(db: Session, pair_id: int, start_date: date) -> List[DailyCheckin]:
-    return db.execute(
-        select(DailyCheckin)
-        .where(and_(DailyCheckin.pair_id == pair_id, DailyCheckin.date >= start_date))
-        .order_by(DailyCheckin.date.desc(), DailyCheckin.updated_at.desc())
-    ).scalars().all()
+async def list_recent_checkins(
+    db: AsyncSession,
+    pair_id: int,
+    start_date: date,
+    limit: int,
+    after: Optional[Tuple[date, datetime, int]] = None,
+) -> List[DailyCheckin]:
+    """One keyset page ordered by (date, updated_at, id) descending.
+
+    ``after`` is the sort key of the last row of the previous page; the scan
+    walks ``ix_daily_checkins_pair_date`` so each page is a bounded range.
+    """
+    stmt = select(DailyCheckin).where(and_(DailyCheckin.pair_id == pair_id, DailyCheckin.date >= start_date))
+    if after is not None:
+        stmt = stmt.where(tuple_(DailyCheckin.date, DailyCheckin.updated_at, DailyCheckin.id) < tuple_(*after))
+    return (await db.execute(
+        stmt.order_by(DailyCheckin.date.desc(), DailyCheckin.updated_at.desc(), DailyCheckin.id.desc()).limit(limit)
+    )).scalars().all()
+
+
+# Export
+async def list_checkin_history_page(
+    db: AsyncSession,
+    pair_id: int,
+    limit: int,
+    after: Optional[Tuple[date, int, int]] = None,
+) -> list:
+    """One keyset page of the pair's check-ins, joined with their habit, ordered by (date, habit_id, user_id).
+
+    ``after`` is the sort key of the last row of the previous page. Each page
+    is a short query of its own, so a caller streaming the whole history
+    holds no connection or cursor between pages.
+    """
+    stmt = (
+        select(
+            DailyCheckin.id,
+            DailyCheckin.date,
+            DailyCheckin.user_id,
+            DailyCheckin.habit_id,
+            Habit.name.label("habit_name"),
+            Habit.type.label("habit_type"),
+            DailyCheckin.value_bool,
+            DailyCheckin.value_number,
+            DailyCheckin.value_text,
+            DailyCheckin.value_time,
+            DailyCheckin.note,
+            DailyCheckin.image_path,
+            DailyCheckin.updated_at,
+        )
+        .outerjoin(Habit, and_(Habit.id == DailyCheckin.habit_id, Habit.pair_id == DailyCheckin.pair_id))
+        .where(DailyCheckin.pair_id == pair_id)
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(DailyCheckin.date, DailyCheckin.habit_id, DailyCheckin.user_id) > tuple_(*after))
+    return (await db.execute(
+        stmt.order_by(DailyCheckin.date, DailyCheckin.habit_id, DailyCheckin.user_id).limit(limit)
+    )).all()
+
+
+# Delta sync
+async def list_habits_changed_since(db: AsyncSession, pair_id: int, since: datetime) -> List[Habit]:
+    return (await db.execute(
+        select(Habit).where(Habit.pair_id == pair_id, Habit.updated_at >= since).order_by(Habit.order_index)
+    )).scalars().all()
+
+
+async def list_checkins_changed_since(db: AsyncSession, pair_id: int, since: Optional[datetime]) -> List[DailyCheckin]:
+    """Check-ins of the pair updated at or after ``since``; all of them when ``since`` is None."""
+    stmt = select(DailyCheckin).where(DailyCheckin.pair_id == pair_id)
+    if since is not None:
+        stmt = stmt.where(DailyCheckin.updated_at >= since)
+    return (await db.execute(stmt.order_by(DailyCheckin.updated_at, DailyCheckin.id))).scalars().all()
+
+
+async def list_deleted_habit_ids(db: AsyncSession, pair_id: int, since: datetime) -> List[int]:
+    return (await db.execute(
+        select(Tombstone.entity_id).where(
+            Tombstone.pair_id == pair_id, Tombstone.entity == "habit", Tombstone.deleted_at >= since
+        )
+    )).scalars().all()
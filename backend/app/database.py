@@ -1,7 +1,12 @@
 from __future__ import annotations
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import settings
 
@@ -10,17 +15,121 @@ class Base(DeclarativeBase):
     pass
 
 
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {},
-    echo=False,
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Plain URLs from .env get the matching asyncio driver
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+_DIALECT_INSERTS = {"sqlite": sqlite_insert, "postgresql": pg_insert}
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+def dialect_insert(db: AsyncSession):
+    """The dialect's ``insert()``, which supports ``ON CONFLICT`` clauses."""
+    dialect = db.get_bind().dialect.name
+    insert = _DIALECT_INSERTS.get(dialect)
+    if insert is None:
+        raise NotImplementedError(f"ON CONFLICT inserts are not supported on {dialect}")
+    return insert
+
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False) if driver else url
+
+
+def _is_sqlite_file(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def _apply_sqlite_pragmas(engine: AsyncEngine, read_only: bool) -> None:
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+        # Negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size=-{settings.sqlite_cache_size_kib}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def add_missing_columns(connection) -> None:
+    """ALTER TABLE ... ADD COLUMN for mapped columns an existing database lacks.
+
+    create_all only creates missing tables; this covers columns added to a
+    model later. Such columns must be nullable or carry a server_default.
+    Run through ``AsyncConnection.run_sync`` after create_all.
+    """
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} "
+            ddl += column.type.compile(dialect=connection.dialect)
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            connection.exec_driver_sql(ddl)
+
+
+def create_missing_indexes(connection) -> None:
+    """CREATE INDEX for indexes added to existing tables; create_all skips those tables entirely."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def build_engines(url: str, sqlite_profile: bool = True) -> tuple[AsyncEngine, AsyncEngine]:
+    """Return ``(write_engine, read_engine)`` for ``url``.
+
+    With the SQLite profile on a file database, writes go through a pool of
+    exactly one connection, so they are serialized in-process instead of
+    contending for the file lock, while reads use their own WAL-mode pool.
+    Other databases share one engine for both roles.
+    """
+    async_url = async_database_url(url)
+    if not (sqlite_profile and _is_sqlite_file(url)):
+        engine = create_async_engine(async_url, echo=False)
+        return engine, engine
+
+    write_engine = create_async_engine(
+        async_url, echo=False, poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0
+    )
+    read_engine = create_async_engine(
+        async_url,
+        echo=False,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.sqlite_read_pool_size,
+        max_overflow=0,
+    )
+    _apply_sqlite_pragmas(write_engine, read_only=False)
+    _apply_sqlite_pragmas(read_engine, read_only=True)
+    return write_engine, read_engine
+
+
+engine, read_engine = build_engines(settings.database_url, settings.sqlite_production_profile)
+# Keep loaded attributes after commit so writes that use RETURNING need no re-fetch
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+ReadSessionLocal = async_sessionmaker(bind=read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
+
+
+async def get_read_db():
+    """Session for handlers that only read; never commit through it."""
+    async with ReadSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,28 +1,107 @@
 from __future__ import annotations
 
-from fastapi import Depends, HTTPException, status
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import request_context_cache
 from app.config import settings
-from app.database import get_db
-from app.models import User
+from app.database import ReadSessionLocal, get_read_db
+from app.models import PairMember, User
 from app.security import decode_token
 from sqlalchemy import select
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False)
+
+
+@dataclass(frozen=True)
+class RequestContext:
+    user: User
+    pair_id: Optional[int]
+
+
+async def get_request_context(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_read_db)
+) -> RequestContext:
+    """Resolve the caller and their pair with one query, cached per user_id.
+
+    crud.create_pair and crud.join_pair invalidate the cached entry.
+    """
+    return await _resolve_context(token, db)
+
+
+async def get_download_context(token: str = Depends(oauth2_scheme)) -> RequestContext:
+    """get_request_context for long streamed downloads such as GET /export.
+
+    The request's get_read_db session stays open, with its pooled connection,
+    until the last byte is sent; this uses its own short session instead.
+    """
+    async with ReadSessionLocal() as db:
+        return await _resolve_context(token, db)
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_stream_context(
+    request: Request, stream_token: Optional[str] = Query(default=None, alias="token")
+) -> RequestContext:
+    """get_request_context for long-lived streams.
+
+    Browsers cannot set headers on EventSource, so a stream token from
+    POST /stream/token is also accepted as ``?token=``; access tokens are
+    only taken from the Authorization header, keeping them out of URLs and
+    access logs. Uses its own short session so an open stream does not hold
+    a pooled connection.
+    """
+    access_token = await optional_oauth2_scheme(request)
+    if not access_token and not stream_token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    async with ReadSessionLocal() as db:
+        if access_token:
+            return await _resolve_context(access_token, db)
+        return await _resolve_context(stream_token, db, token_type="stream")
+
+
+async def _resolve_context(token: str, db: AsyncSession, token_type: Optional[str] = None) -> RequestContext:
+    # Access tokens carry no "typ"; refresh and stream tokens are only accepted where asked for
     try:
         payload = decode_token(token)
+        if payload.get("typ") != token_type:
+            raise ValueError("Wrong token type")
         user_id = int(payload.get("sub"))
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
 
-    user = db.execute(select(User).where(User.id == user_id)).scalar_one_or_none()
-    if not user:
+    ctx = request_context_cache.get(user_id)
+    if ctx is not None:
+        return ctx
+
+    # Simplify to single pair for MVP: the earliest membership wins
+    row = (
+        await db.execute(
+            select(User, PairMember.pair_id)
+            .outerjoin(PairMember, PairMember.user_id == User.id)
+            .where(User.id == user_id)
+            .order_by(PairMember.id)
+            .limit(1)
+        )
+    ).first()
+    if not row:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
+    ctx = RequestContext(user=row[0], pair_id=row[1])
+    request_context_cache.set(user_id, ctx)
+    return ctx
+
+
+async def get_current_user(ctx: RequestContext = Depends(get_request_context)) -> User:
+    return ctx.user
+
+
+async def get_current_pair_id(ctx: RequestContext = Depends(get_request_context)) -> int:
+    if ctx.pair_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Please create or join a pair first")
+    return ctx.pair_id
@@ -0,0 +1,215 @@
+"""Pair-scoped pub/sub feeding the /stream endpoint.
+
+crud publishes after committing; every process delivers each event to its
+own local subscribers. The backend decides how events travel between
+processes: in-process only by default, Redis pub/sub when
+EVENT_BACKEND_URL points at a Redis server.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import signal
+import threading
+from typing import AsyncIterator, Callable, Iterable, Optional
+
+import orjson
+
+from app.config import settings
+from app.models import DailyCheckin, Habit
+from app.serializers import checkin_to_dict, habit_to_dict
+
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[int, str], None]
+
+# Sent in place of events a subscriber missed; clients should refetch
+RESYNC = orjson.dumps({"type": "resync"}).decode()
+# Larger check-in writes (imports) are announced as a resync instead of row by row
+MAX_EVENT_CHECKINS = 50
+
+
+class InMemoryBackend:
+    """Single-process transport: published events are delivered directly."""
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def publish(self, pair_id: int, data: str) -> None:
+        self._deliver(pair_id, data)
+
+    async def stop(self) -> None:
+        pass
+
+
+class RedisBackend:
+    """Shares events between worker processes through Redis pub/sub."""
+
+    def __init__(self, url: str, channel_prefix: str = "heartsync:pair:") -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("A redis:// EVENT_BACKEND_URL requires the 'redis' package") from exc
+        self.channel_prefix = channel_prefix
+        self._redis = redis.from_url(url)
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self._task = asyncio.create_task(self._listen(deliver))
+
+    async def _listen(self, deliver: Deliver) -> None:
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.psubscribe(f"{self.channel_prefix}*")
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    pair_id = int(message["channel"].decode()[len(self.channel_prefix):])
+                    deliver(pair_id, message["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Redis event subscription failed; reconnecting", exc_info=True)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def publish(self, pair_id: int, data: str) -> None:
+        await self._redis.publish(f"{self.channel_prefix}{pair_id}", data)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._redis.aclose()
+
+
+def backend_from_url(url: str):
+    if not url or url == "memory://":
+        return InMemoryBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported EVENT_BACKEND_URL: {url}")
+
+
+class PairEventBroker:
+    """Fans events out to the open streams of a pair.
+
+    Each subscriber gets a bounded queue of encoded events; one that falls
+    ``queue_size`` events behind is reset to a single RESYNC. ``None`` in a
+    queue means the broker is shutting down.
+    """
+
+    def __init__(self, backend, queue_size: int) -> None:
+        self.backend = backend
+        self.queue_size = queue_size
+        self._subscribers: dict[int, set[asyncio.Queue[Optional[str]]]] = {}
+        self.running = False
+
+    async def start(self) -> None:
+        if not self.running:
+            await self.backend.start(self._deliver)
+            self.running = True
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self.running = False
+        await self.backend.stop()
+        self.close_streams()
+
+    def close_streams(self) -> None:
+        """End every open stream; clients reconnect on their own."""
+        for queues in self._subscribers.values():
+            for queue in queues:
+                _replace_contents(queue, None)
+
+    async def publish(self, pair_id: int, event_type: str, **payload) -> None:
+        data = orjson.dumps({"type": event_type, "pair_id": pair_id, **payload}).decode()
+        if not self.running:
+            # Outside the app lifespan (scripts, benchmarks) only local subscribers exist
+            self._deliver(pair_id, data)
+            return
+        try:
+            await self.backend.publish(pair_id, data)
+        except Exception:
+            # The write is already committed; a lost notification only delays clients until their next fetch
+            logger.warning("Could not publish %s for pair %s", event_type, pair_id, exc_info=True)
+
+    def _deliver(self, pair_id: int, data: str) -> None:
+        for queue in self._subscribers.get(pair_id, ()):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                _replace_contents(queue, RESYNC)
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, pair_id: int) -> AsyncIterator[asyncio.Queue[Optional[str]]]:
+        queue: asyncio.Queue[Optional[str]] = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(pair_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(pair_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[pair_id]
+
+    def subscriber_count(self, pair_id: Optional[int] = None) -> int:
+        if pair_id is not None:
+            return len(self._subscribers.get(pair_id, ()))
+        return sum(len(queues) for queues in self._subscribers.values())
+
+
+def _replace_contents(queue: asyncio.Queue, item: Optional[str]) -> None:
+    while not queue.empty():
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+
+event_broker = PairEventBroker(backend_from_url(settings.event_backend_url), queue_size=settings.event_stream_queue_size)
+
+
+def close_streams_on_exit_signals() -> None:
+    """Chain SIGINT/SIGTERM handlers that end every open stream.
+
+    uvicorn waits for open connections to close before it runs lifespan
+    shutdown, so ``event_broker.stop()`` alone would never end a stream.
+    Call from the lifespan startup, after the server installed its handlers.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous) -> None:
+            loop.call_soon_threadsafe(event_broker.close_streams)
+            previous(signum, frame)
+
+        signal.signal(sig, handler)
+
+
+async def publish_checkins(checkins: Iterable[DailyCheckin]) -> None:
+    by_pair: dict[int, list[DailyCheckin]] = {}
+    for ci in checkins:
+        by_pair.setdefault(ci.pair_id, []).append(ci)
+    for pair_id, rows in by_pair.items():
+        if len(rows) > MAX_EVENT_CHECKINS:
+            await event_broker.publish(pair_id, "resync")
+        else:
+            await event_broker.publish(pair_id, "checkins", checkins=[checkin_to_dict(ci) for ci in rows])
+
+
+async def publish_habit(event_type: str, habit: Habit) -> None:
+    if event_type == "habit.deleted":
+        await event_broker.publish(habit.pair_id, event_type, habit_id=habit.id)
+    else:
+        await event_broker.publish(habit.pair_id, event_type, habit=habit_to_dict(habit))
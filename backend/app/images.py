@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image, ImageOps, features
+
+from app.cache import TTLCache
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> longest edge in pixels
+VARIANTS = {"thumb": 256, "preview": 1024}
+VARIANT_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+_VARIANT_EXT = ".webp" if VARIANT_FORMAT == "WEBP" else ".jpg"
+
+# Pillow releases the GIL while decoding and resizing, so threads are enough
+_executor = ThreadPoolExecutor(max_workers=settings.image_variant_workers, thread_name_prefix="image-variants")
+_inflight: set[Path] = set()
+_ready = TTLCache(maxsize=100_000, ttl=3600)
+_failed = TTLCache(maxsize=10_000, ttl=3600)
+
+
+def variant_path(original: Path, name: str) -> Path:
+    # Stored next to the original: <hash>.jpg -> <hash>.jpg.thumb.webp
+    return original.with_name(f"{original.name}.{name}{_VARIANT_EXT}")
+
+
+def variant_owner(path: Path) -> Path:
+    """The original a variant file was derived from; other paths map to themselves."""
+    parts = path.name.rsplit(".", 2)
+    if len(parts) == 3 and parts[1] in VARIANTS and f".{parts[2]}" == _VARIANT_EXT:
+        return path.with_name(parts[0])
+    return path
+
+
+def _static_path(web_path: str) -> Optional[Path]:
+    if not web_path.startswith("/static/"):
+        return None
+    return settings.static_dir / web_path[len("/static/"):]
+
+
+def _generate_variants(original: Path) -> None:
+    try:
+        with Image.open(original) as img:
+            img = ImageOps.exif_transpose(img)
+            for name, edge in VARIANTS.items():
+                dest = variant_path(original, name)
+                if dest.exists():
+                    continue
+                variant = img.copy()
+                variant.thumbnail((edge, edge))
+                if VARIANT_FORMAT == "JPEG" and variant.mode not in ("RGB", "L"):
+                    variant = variant.convert("RGB")
+                tmp = dest.with_name(f".{dest.name}.part")
+                variant.save(tmp, format=VARIANT_FORMAT, quality=80)
+                os.replace(tmp, dest)
+    except Exception:
+        logger.warning("Could not build image variants for %s", original, exc_info=True)
+        _failed.set(original, True)
+    finally:
+        _inflight.discard(original)
+
+
+def schedule_variants(image_url: str) -> None:
+    """Queue background generation of every variant of an uploaded image."""
+    original = _static_path(image_url)
+    if original is None or original in _inflight or _failed.get(original):
+        return
+    _inflight.add(original)
+    _executor.submit(_generate_variants, original)
+
+
+def variant_urls(image_url: Optional[str]) -> dict[str, Optional[str]]:
+    """URL per variant, falling back to the original while a variant is pending.
+
+    A missing variant is (re)scheduled, which also backfills images uploaded
+    before variants existed.
+    """
+    if not image_url:
+        return {name: None for name in VARIANTS}
+    original = _static_path(image_url)
+    urls: dict[str, Optional[str]] = {}
+    pending = False
+    for name in VARIANTS:
+        url = image_url
+        if original is not None:
+            dest = variant_path(original, name)
+            if _ready.get(dest) or dest.exists():
+                _ready.set(dest, True)
+                url = image_url + dest.name[len(original.name):]
+            else:
+                pending = True
+        urls[name] = url
+    if pending:
+        schedule_variants(image_url)
+    return urls
+
+
+def variants_settled(image_url: Optional[str]) -> bool:
+    """Whether variant_urls(image_url) will keep returning the same URLs.
+
+    False while any variant is still pending. Only consults the caches that
+    variant_urls fills, so call it after serializing.
+    """
+    original = _static_path(image_url) if image_url else None
+    if original is None or _failed.get(original):
+        return True
+    return all(_ready.get(variant_path(original, name)) for name in VARIANTS)
+
+
+def shutdown_variant_workers() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
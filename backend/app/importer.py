@@ -0,0 +1,196 @@
+"""Bulk import of historical check-ins from CSV or NDJSON (see POST /import).
+
+Records are read lazily from the uploaded file and written with multi-row
+upserts of ``batch_size`` rows, one transaction per batch. The accepted
+columns are those of GET /export, so an export can be imported back; only
+``date`` and a habit (``habit_name`` or ``habit_id``) are required. Rows
+are imported for the calling user; rows whose ``user_id`` names someone
+else (the partner's half of a pair export) are skipped and counted.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import logging
+from datetime import date as date_cls, datetime
+from typing import IO, Iterator, Optional
+
+import orjson
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import checkin_row, create_habit, list_habits, upsert_checkin_rows
+from app.schemas import HabitType
+
+
+logger = logging.getLogger(__name__)
+
+# Per-row errors reported back; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+class CheckinImportRow(BaseModel):
+    date: date_cls
+    user_id: Optional[int] = None
+    habit_name: Optional[str] = Field(default=None, max_length=100)
+    habit_id: Optional[int] = None
+    habit_type: Optional[HabitType] = None
+    value_bool: Optional[bool] = None
+    value_number: Optional[int] = None
+    value_text: Optional[str] = Field(default=None, max_length=500)
+    value_time: Optional[str] = Field(default=None, pattern=r"^\d{2}:\d{2}$")
+    note: Optional[str] = Field(default=None, max_length=1000)
+
+
+def iter_csv_records(file: IO[bytes]) -> Iterator[tuple[int, dict]]:
+    """(line number, record) per CSV row; empty cells become None."""
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+    for record in reader:
+        yield reader.line_num, {key: (value if value != "" else None) for key, value in record.items() if key}
+
+
+def iter_ndjson_records(file: IO[bytes]) -> Iterator[tuple[int, dict]]:
+    """(line number, record) per non-empty line; unparsable lines yield an ``_error`` record."""
+    for line_no, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError as exc:
+            record = {"_error": f"Invalid JSON: {exc}"}
+        if not isinstance(record, dict):
+            record = {"_error": "Expected a JSON object"}
+        yield line_no, record
+
+
+def _infer_type(row: CheckinImportRow) -> str:
+    if row.habit_type:
+        return row.habit_type
+    if row.value_number is not None:
+        return "number"
+    if row.value_time is not None:
+        return "time"
+    if row.value_text is not None:
+        return "text"
+    return "boolean"
+
+
+class CheckinImporter:
+    def __init__(self, db: AsyncSession, pair_id: int, user_id: int, batch_size: int) -> None:
+        self.db = db
+        self.pair_id = pair_id
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.imported = 0
+        self.skipped = 0
+        self.error_count = 0
+        self.errors: list[dict] = []
+        self.created_habits: list[str] = []
+        self._habit_ids_by_name: dict[str, int] = {}
+        self._pair_habit_ids: set[int] = set()
+        # habit_id -> name from the habit lines of an NDJSON export
+        self._foreign_habit_names: dict[int, str] = {}
+        self._foreign_habit_types: dict[int, str] = {}
+
+    def _error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    async def run(self, records: Iterator[tuple[int, dict]]) -> dict:
+        for habit in await list_habits(self.db, self.pair_id):
+            self._habit_ids_by_name.setdefault(habit.name, habit.id)
+            self._pair_habit_ids.add(habit.id)
+
+        # (user_id, habit_id, date) -> (line, row); a key repeated within a batch keeps its last row
+        batch: dict[tuple, tuple[int, dict]] = {}
+        for line, record in records:
+            if "_error" in record:
+                self._error(line, record["_error"])
+                continue
+            if record.get("record") == "habit":
+                self._register_foreign_habit(record)
+                continue
+            try:
+                row = CheckinImportRow.model_validate(record)
+            except ValidationError as exc:
+                first = exc.errors(include_url=False)[0]
+                self._error(line, f"{'.'.join(map(str, first['loc'])) or 'row'}: {first['msg']}")
+                continue
+            if row.user_id is not None and row.user_id != self.user_id:
+                # Never written as the caller: it could overwrite their own check-in for the same day
+                self.skipped += 1
+                continue
+            habit_id = await self._resolve_habit(row)
+            if habit_id is None:
+                self._error(line, "Missing habit_name or unknown habit_id")
+                continue
+            values = row.model_dump(include={"value_bool", "value_number", "value_text", "value_time", "note"})
+            batch[(self.user_id, habit_id, row.date)] = (
+                line,
+                checkin_row(self.pair_id, self.user_id, habit_id, row.date, values),
+            )
+            if len(batch) >= self.batch_size:
+                await self._flush(list(batch.values()))
+                batch.clear()
+        if batch:
+            await self._flush(list(batch.values()))
+        return {
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "created_habits": self.created_habits,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+    def _register_foreign_habit(self, record: dict) -> None:
+        if isinstance(record.get("id"), int) and isinstance(record.get("name"), str):
+            self._foreign_habit_names[record["id"]] = record["name"]
+            if record.get("type") in ("boolean", "number", "text", "time"):
+                self._foreign_habit_types[record["id"]] = record["type"]
+
+    async def _resolve_habit(self, row: CheckinImportRow) -> Optional[int]:
+        name = row.habit_name.strip() if row.habit_name else None
+        habit_type = row.habit_type
+        if name is None and row.habit_id is not None:
+            if row.habit_id in self._foreign_habit_names:
+                name = self._foreign_habit_names[row.habit_id]
+                habit_type = habit_type or self._foreign_habit_types.get(row.habit_id)
+            elif row.habit_id in self._pair_habit_ids:
+                return row.habit_id
+        if not name:
+            return None
+        habit_id = self._habit_ids_by_name.get(name)
+        if habit_id is None:
+            habit = await create_habit(
+                self.db,
+                self.pair_id,
+                name,
+                habit_type or _infer_type(row),
+                True,
+                len(self._habit_ids_by_name),
+            )
+            habit_id = self._habit_ids_by_name[name] = habit.id
+            self._pair_habit_ids.add(habit.id)
+            self.created_habits.append(name)
+        return habit_id
+
+    async def _flush(self, batch: list[tuple[int, dict]]) -> None:
+        # Stamped at write time: a batch committed minutes into a long import
+        # must not fall behind a delta sync token issued in the meantime
+        now = datetime.utcnow()
+        for _, row in batch:
+            row["updated_at"] = now
+        try:
+            await upsert_checkin_rows(self.db, [row for _, row in batch])
+            self.imported += len(batch)
+        except Exception:
+            logger.warning("Import batch of %d rows failed; retrying row by row", len(batch), exc_info=True)
+            await self.db.rollback()
+            for line, row in batch:
+                try:
+                    await upsert_checkin_rows(self.db, [row])
+                    self.imported += 1
+                except Exception as exc:
+                    await self.db.rollback()
+                    self._error(line, f"Could not be written: {exc.__class__.__name__}")
@@ -3,13 +3,21 @@ from __future__ import annotations
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
 
 from app.config import settings
-from app.database import Base, engine
+from app.database import Base, add_missing_columns, create_missing_indexes, engine
 from app.api.v1.router import api_router as api_v1_router
+from app.events import close_streams_on_exit_signals, event_broker
+from app.images import shutdown_variant_workers
+from app.middleware import BodySizeLimitMiddleware
+from app.security import PasswordHasherBusy
+from app.serializers import ORJSONResponse
+from app.staticfiles import CachedStaticFiles, content_addressed_etag
+from app.tasks import start_background_tasks, stop_background_tasks
+from app.writer import checkin_writer
 
 
 @asynccontextmanager
@@ -20,11 +28,37 @@ async def lifespan(app: FastAPI):
     (settings.static_dir / "uploads").mkdir(parents=True, exist_ok=True)
 
     # Initialize database tables (no-op until models are defined)
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        await conn.run_sync(create_missing_indexes)
+
+    await event_broker.start()
+    close_streams_on_exit_signals()
+    tasks = start_background_tasks()
+    if settings.checkin_write_coalescing:
+        checkin_writer.start()
     yield
+    await checkin_writer.stop()
+    # Ends event streams that are still open
+    await event_broker.stop()
+    await stop_background_tasks(tasks)
+    shutdown_variant_workers()
+
 
+app = FastAPI(
+    title=settings.app_name,
+    version=settings.version,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
-app = FastAPI(title=settings.app_name, version=settings.version, lifespan=lifespan)
+# Oversized bodies are refused while they arrive; added before CORS so 413s still carry CORS headers
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    default_limit=settings.max_request_bytes,
+    limits={"/api/v1/import": settings.import_max_bytes},
+)
 
 # CORS
 allow_origins = (
@@ -38,8 +72,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    # Shed load quickly rather than letting auth requests pile up behind bcrypt
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+
 # Routers
 app.include_router(api_v1_router, prefix="/api/v1")
 
-# Static files
-app.mount("/static", StaticFiles(directory=str(settings.static_dir)), name="static")
+# Static files: content-addressed uploads never change, so clients may cache them forever
+app.mount(
+    "/static",
+    CachedStaticFiles(
+        directory=str(settings.static_dir),
+        is_immutable=lambda rel_path: content_addressed_etag(rel_path) is not None,
+    ),
+    name="static",
+)
+
+# Built frontend (`npm run build`), if present; Vite fingerprints everything under assets/
+if settings.frontend_dist_dir.is_dir():
+    app.mount(
+        "/",
+        CachedStaticFiles(
+            directory=str(settings.frontend_dist_dir),
+            is_immutable=lambda rel_path: rel_path.startswith("assets/"),
+            precompressed=True,
+            spa_fallback=True,
+        ),
+        name="frontend",
+    )
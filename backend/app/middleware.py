@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from typing import Mapping, Optional
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class BodySizeLimitMiddleware:
+    """Refuse request bodies over a size limit while they are being received.
+
+    Starlette spools a whole multipart body to a temporary file before the
+    handler runs, so a size check in the handler only rejects a file that
+    has already been uploaded completely. Here a Content-Length over the
+    limit is answered with 413 before any of the body is read, and a body
+    without one is cut off as soon as it passes the limit.
+
+    ``limits`` maps path prefixes to byte limits, the longest matching prefix
+    winning; other paths get ``default_limit``.
+    """
+
+    def __init__(self, app: ASGIApp, default_limit: int, limits: Optional[Mapping[str, int]] = None) -> None:
+        self.app = app
+        self.default_limit = default_limit
+        self.limits = sorted((limits or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def _limit_for(self, path: str) -> int:
+        for prefix, limit in self.limits:
+            if path.startswith(prefix):
+                return limit
+        return self.default_limit
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limit = self._limit_for(scope["path"])
+        detail = f"Request body exceeds {limit} bytes"
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, content={"detail": detail})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI re-raises HTTPExceptions from body parsing as they are
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
-from sqlalchemy import Boolean, Date, DateTime, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -29,7 +29,8 @@ class RefreshToken(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
-    token: Mapped[str] = mapped_column(String(512), unique=True, index=True)
+    # SHA-256 hex digest of the JWT; the column keeps its original name so existing databases still load
+    token_hash: Mapped[str] = mapped_column("token", String(64), unique=True, index=True)
     expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     revoked: Mapped[bool] = mapped_column(Boolean, default=False)
@@ -43,6 +44,8 @@ class Pair(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     code: Mapped[str] = mapped_column(String(12), unique=True, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Bumped by every write that changes what the pair's overview shows; see crud.bump_pair_version
+    version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
     members: Mapped[list[PairMember]] = relationship(
         "PairMember", back_populates="pair", cascade="all, delete-orphan"
@@ -64,6 +67,7 @@ class PairMember(Base):
 
 class Habit(Base):
     __tablename__ = "habits"
+    __table_args__ = (Index("ix_habits_pair_updated", "pair_id", "updated_at"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     pair_id: Mapped[int] = mapped_column(ForeignKey("pairs.id", ondelete="CASCADE"), index=True)
@@ -72,11 +76,21 @@ class Habit(Base):
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     order_index: Mapped[int] = mapped_column(Integer, default=0)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # NULL for habits last written before the column existed
+    updated_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
 
 
 class DailyCheckin(Base):
     __tablename__ = "daily_checkins"
-    __table_args__ = (UniqueConstraint("user_id", "habit_id", "date", name="uq_user_habit_date"),)
+    __table_args__ = (
+        UniqueConstraint("user_id", "habit_id", "date", name="uq_user_habit_date"),
+        # Serves both the per-day lookups and the keyset-paginated feed
+        Index("ix_daily_checkins_pair_date", "pair_id", "date", "updated_at", "id"),
+        # Delta sync: everything a pair changed since a point in time
+        Index("ix_daily_checkins_pair_updated", "pair_id", "updated_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     pair_id: Mapped[int] = mapped_column(ForeignKey("pairs.id", ondelete="CASCADE"), index=True)
@@ -89,5 +103,39 @@ class DailyCheckin(Base):
     value_text: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     value_time: Mapped[Optional[str]] = mapped_column(String(8), nullable=True)  # HH:MM
     note: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
-    image_path: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    # Also the reference that keeps a file in the upload store alive
+    image_path: Mapped[Optional[str]] = mapped_column(String(255), nullable=True, index=True)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class HabitStats(Base):
+    """Streak and completion aggregates per habit and user, maintained by app.stats."""
+
+    __tablename__ = "habit_stats"
+    __table_args__ = (UniqueConstraint("habit_id", "user_id", name="uq_habit_stats_habit_user"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    pair_id: Mapped[int] = mapped_column(ForeignKey("pairs.id", ondelete="CASCADE"), index=True)
+    habit_id: Mapped[int] = mapped_column(ForeignKey("habits.id", ondelete="CASCADE"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    # Latest completed day; NULL while nothing was completed
+    last_completed: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
+    # Bit i set = completed on last_completed minus i days, for the last stats.WINDOW_DAYS days
+    recent_days: Mapped[int] = mapped_column(BigInteger, default=0)
+    # Consecutive completed days ending at last_completed
+    current_run: Mapped[int] = mapped_column(Integer, default=0)
+    longest_streak: Mapped[int] = mapped_column(Integer, default=0)
+    total_completed: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class Tombstone(Base):
+    """A deleted row, kept for delta sync until SYNC_TOMBSTONE_RETENTION_DAYS pass."""
+
+    __tablename__ = "tombstones"
+    __table_args__ = (Index("ix_tombstones_pair_deleted", "pair_id", "deleted_at"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    pair_id: Mapped[int] = mapped_column(ForeignKey("pairs.id", ondelete="CASCADE"))
+    entity: Mapped[str] = mapped_column(String(16))  # habit
+    entity_id: Mapped[int] = mapped_column(Integer)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,225 @@
+"""Read-through cache of rendered GET responses, scoped by pair.
+
+Keys always include the pair's data version (see crud.bump_pair_version), so
+an entry can never be served after a write, even one made by another
+worker. crud also invalidates a pair's entries on every write so memory is
+reclaimed right away. Bodies are stored rendered, so a hit costs the version
+lookup and nothing else.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Optional
+
+import orjson
+from starlette.responses import Response
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Rendered body and its headers
+Entry = tuple[bytes, dict[str, str]]
+
+
+class MemoryResponseBackend:
+    """Per-process LRU bounded by entry count and total body size."""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data: OrderedDict[tuple[int, Hashable], tuple[float, Entry]] = OrderedDict()
+        self._by_pair: dict[int, set[tuple[int, Hashable]]] = {}
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def get(self, pair_id: int, key: Hashable) -> Optional[Entry]:
+        item = self._data.get((pair_id, key))
+        if item is None:
+            return None
+        expires_at, entry = item
+        if expires_at < time.monotonic():
+            self._remove((pair_id, key))
+            return None
+        self._data.move_to_end((pair_id, key))
+        return entry
+
+    async def set(self, pair_id: int, key: Hashable, entry: Entry) -> None:
+        if len(entry[0]) > self.max_bytes:
+            return
+        full_key = (pair_id, key)
+        self._remove(full_key)
+        self._data[full_key] = (time.monotonic() + self.ttl, entry)
+        self._by_pair.setdefault(pair_id, set()).add(full_key)
+        self.bytes += len(entry[0])
+        while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._data)))
+
+    async def invalidate_pair(self, pair_id: int) -> int:
+        keys = self._by_pair.pop(pair_id, set())
+        for full_key in keys:
+            _, entry = self._data.pop(full_key)
+            self.bytes -= len(entry[0])
+        return len(keys)
+
+    async def clear(self) -> None:
+        self._data.clear()
+        self._by_pair.clear()
+        self.bytes = 0
+
+    def _remove(self, full_key: tuple[int, Hashable]) -> None:
+        item = self._data.pop(full_key, None)
+        if item is None:
+            return
+        self.bytes -= len(item[1][0])
+        keys = self._by_pair.get(full_key[0])
+        if keys is not None:
+            keys.discard(full_key)
+            if not keys:
+                del self._by_pair[full_key[0]]
+
+    def stats(self) -> dict:
+        return {"entries": len(self._data), "bytes": self.bytes}
+
+
+class RedisResponseBackend:
+    """Shared between workers; entries expire after ``ttl`` seconds.
+
+    Stale versions are never read again, so invalidation only has to stop
+    them from lingering until their TTL: each pair keeps a set of its keys.
+    """
+
+    def __init__(self, url: str, ttl: float, prefix: str = "heartsync:resp:") -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("A redis:// RESPONSE_CACHE_URL requires the 'redis' package") from exc
+        self.ttl = int(ttl)
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+
+    def _key(self, pair_id: int, key: Hashable) -> str:
+        return f"{self.prefix}{pair_id}:{key}"
+
+    async def get(self, pair_id: int, key: Hashable) -> Optional[Entry]:
+        raw = await self._redis.get(self._key(pair_id, key))
+        if raw is None:
+            return None
+        headers_len = int.from_bytes(raw[:4], "big")
+        return raw[4 + headers_len:], orjson.loads(raw[4:4 + headers_len])
+
+    async def set(self, pair_id: int, key: Hashable, entry: Entry) -> None:
+        body, headers = entry
+        encoded_headers = orjson.dumps(headers)
+        redis_key = self._key(pair_id, key)
+        index_key = f"{self.prefix}{pair_id}"
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(redis_key, len(encoded_headers).to_bytes(4, "big") + encoded_headers + body, ex=self.ttl)
+            pipe.sadd(index_key, redis_key)
+            pipe.expire(index_key, self.ttl)
+            await pipe.execute()
+
+    async def invalidate_pair(self, pair_id: int) -> int:
+        index_key = f"{self.prefix}{pair_id}"
+        keys = await self._redis.smembers(index_key)
+        if keys:
+            await self._redis.delete(*keys, index_key)
+        return len(keys)
+
+    async def clear(self) -> None:
+        async for redis_key in self._redis.scan_iter(match=f"{self.prefix}*"):
+            await self._redis.delete(redis_key)
+
+    def stats(self) -> dict:
+        return {}
+
+
+def backend_from_url(url: str):
+    if not url or url == "memory://":
+        return MemoryResponseBackend(
+            max_entries=settings.response_cache_max_entries,
+            max_bytes=settings.response_cache_max_bytes,
+            ttl=settings.response_cache_ttl_seconds,
+        )
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisResponseBackend(url, ttl=settings.response_cache_ttl_seconds)
+    raise ValueError(f"Unsupported RESPONSE_CACHE_URL: {url}")
+
+
+class ResponseCache:
+    """Counts hits and misses around a backend; backend errors count as misses."""
+
+    def __init__(self, backend, enabled: bool = True) -> None:
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    async def get_or_build(
+        self,
+        pair_id: int,
+        key: Hashable,
+        build: Callable[[], Awaitable[tuple[Response, bool]]],
+    ) -> Response:
+        """Return the cached response for ``key`` or build, store and return it.
+
+        ``build`` returns the response and whether it may be stored.
+        """
+        if not self.enabled:
+            return (await build())[0]
+        try:
+            entry = await self.backend.get(pair_id, key)
+        except Exception:
+            logger.warning("Response cache read failed", exc_info=True)
+            self.errors += 1
+            entry = None
+        if entry is not None:
+            self.hits += 1
+            body, headers = entry
+            return Response(content=body, headers=headers)
+
+        self.misses += 1
+        response, cacheable = await build()
+        if cacheable and response.status_code == 200:
+            try:
+                await self.backend.set(pair_id, key, (bytes(response.body), dict(response.headers)))
+                self.stores += 1
+            except Exception:
+                logger.warning("Response cache write failed", exc_info=True)
+                self.errors += 1
+        return response
+
+    async def invalidate_pair(self, *pair_ids: int) -> None:
+        if not self.enabled:
+            return
+        for pair_id in pair_ids:
+            try:
+                self.invalidations += await self.backend.invalidate_pair(pair_id)
+            except Exception:
+                logger.warning("Response cache invalidation failed for pair %s", pair_id, exc_info=True)
+                self.errors += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            **self.backend.stats(),
+        }
+
+
+response_cache = ResponseCache(backend_from_url(settings.response_cache_url), enabled=settings.response_cache_enabled)
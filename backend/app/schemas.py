@@ -2,9 +2,12 @@ from __future__ import annotations
 
 from datetime import datetime
 from datetime import date
+from datetime import date as date_cls
 from typing import Optional, Literal
 
-from pydantic import BaseModel, EmailStr
+from pydantic import AliasChoices, BaseModel, EmailStr, Field, model_validator
+
+from app.images import variant_urls
 
 
 class UserCreate(BaseModel):
@@ -28,6 +31,11 @@ class TokenPair(BaseModel):
     token_type: str = "bearer"
 
 
+class StreamToken(BaseModel):
+    token: str
+    expires_in: int
+
+
 class TokenRefreshRequest(BaseModel):
     refresh_token: str
 
@@ -90,7 +98,7 @@ class HabitRead(HabitBase):
 
 # Check-ins
 class CheckinBase(BaseModel):
-    date: Optional[date] = None
+    date: Optional[date_cls] = None
     value_bool: Optional[bool] = None
     value_number: Optional[int] = None
     value_text: Optional[str] = None
@@ -105,12 +113,41 @@ class CheckinCreate(CheckinBase):
 
 class CheckinRead(CheckinBase):
     id: int
+    # ORM rows carry the stored web path as ``image_path``
+    image_url: Optional[str] = Field(default=None, validation_alias=AliasChoices("image_url", "image_path"))
+    # Downscaled copies of image_url; equal to image_url while still being generated
+    thumbnail_url: Optional[str] = None
+    preview_url: Optional[str] = None
     habit_id: int
     user_id: int
 
     class Config:
         from_attributes = True
 
+    @model_validator(mode="after")
+    def _fill_variant_urls(self) -> CheckinRead:
+        if self.image_url and not (self.thumbnail_url and self.preview_url):
+            urls = variant_urls(self.image_url)
+            self.thumbnail_url = self.thumbnail_url or urls["thumb"]
+            self.preview_url = self.preview_url or urls["preview"]
+        return self
+
+
+class CheckinBatchItem(BaseModel):
+    habit_id: int
+    value_bool: Optional[bool] = None
+    value_number: Optional[int] = None
+    value_text: Optional[str] = None
+    value_time: Optional[str] = None
+    note: Optional[str] = None
+    # Position of this item's file in the request's ``images`` parts
+    image_index: Optional[int] = None
+
+
+class CheckinBatchRequest(BaseModel):
+    date: Optional[date_cls] = None
+    items: list[CheckinBatchItem]
+
 
 class TodayTask(BaseModel):
     habit: HabitRead
@@ -132,3 +169,65 @@ class FeedItem(BaseModel):
 
 class FeedResponse(BaseModel):
     items: list[FeedItem]
+    next_cursor: Optional[str] = None
+
+
+class HabitStatsRead(BaseModel):
+    habit_id: int
+    user_id: int
+    current_streak: int
+    longest_streak: int
+    total_completed: int
+    last_completed: Optional[date_cls] = None
+    # Share of the last 7 / 28 days (today included) that were completed
+    completion_rate_7d: float
+    completion_rate_28d: float
+
+
+class HeatmapUser(BaseModel):
+    user_id: int
+    # Base64 bitset, bit i (byte i // 8, least significant bit first) = day i of the year completed
+    bitmap: str
+    completed: int
+
+
+class HeatmapResponse(BaseModel):
+    habit_id: int
+    year: int
+    days: int
+    users: list[HeatmapUser]
+
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportResult(BaseModel):
+    imported: int
+    # Rows of another user (``user_id`` column of a pair export), not imported
+    skipped: int
+    created_habits: list[str]
+    # All rejected rows; ``errors`` lists at most the first 1000
+    error_count: int
+    errors: list[ImportRowError]
+
+
+class SyncResponse(BaseModel):
+    """GET /sync. With ``full`` the client replaces its state, otherwise it
+    upserts by id and drops deleted habits along with their check-ins."""
+
+    full: bool
+    habits: list[HabitRead]
+    checkins: list[CheckinRead]
+    deleted_habit_ids: list[int]
+    token: str
+
+
+class CompactFeedResponse(BaseModel):
+    """/overview/feed?format=compact: each habit once, items omit null fields."""
+
+    format: Literal["compact"] = "compact"
+    habits: list[HabitRead]
+    items: list[CheckinRead]
+    next_cursor: Optional[str] = None
@@ -1,7 +1,12 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import secrets
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -9,15 +14,56 @@ from passlib.context import CryptContext
 from app.config import settings
 
 
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 
 
-def hash_password(plain_password: str) -> str:
-    return password_context.hash(plain_password)
+class PasswordHasherBusy(RuntimeError):
+    """Raised instead of queueing when the password hashing pool is saturated."""
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return password_context.verify(plain_password, hashed_password)
+# bcrypt releases the GIL, so a small dedicated thread pool keeps login bursts
+# from starving the request threadpool.
+_hash_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt")
+_hash_capacity = settings.password_hash_workers + settings.password_hash_queue_size
+_hash_inflight = 0
+_hash_lock = threading.Lock()
+
+
+def _release_hash_slot(_: Future) -> None:
+    global _hash_inflight
+    with _hash_lock:
+        _hash_inflight -= 1
+
+
+def _submit_hash_job(fn: Callable[..., Any], *args: Any) -> Future:
+    global _hash_inflight
+    with _hash_lock:
+        if _hash_inflight >= _hash_capacity:
+            raise PasswordHasherBusy("Password hashing queue is full")
+        _hash_inflight += 1
+    try:
+        future = _hash_executor.submit(fn, *args)
+    except BaseException:
+        with _hash_lock:
+            _hash_inflight -= 1
+        raise
+    future.add_done_callback(_release_hash_slot)
+    return future
+
+
+async def hash_password(plain_password: str) -> str:
+    return await asyncio.wrap_future(_submit_hash_job(password_context.hash, plain_password))
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.wrap_future(_submit_hash_job(password_context.verify, plain_password, hashed_password))
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Verify a password; also return a new hash when the stored one uses an outdated cost."""
+    return await asyncio.wrap_future(
+        _submit_hash_job(password_context.verify_and_update, plain_password, hashed_password)
+    )
 
 
 def create_access_token(subject: str | int, expires_minutes: Optional[int] = None) -> str:
@@ -30,10 +76,22 @@ def create_access_token(subject: str | int, expires_minutes: Optional[int] = Non
 def create_refresh_token(subject: str | int, expires_days: Optional[int] = None) -> str:
     expire_days = expires_days or settings.refresh_token_expire_days
     expire = datetime.now(timezone.utc) + timedelta(days=expire_days)
-    to_encode: dict[str, Any] = {"sub": str(subject), "exp": expire, "typ": "refresh"}
+    # jti keeps tokens issued within the same second distinct
+    to_encode: dict[str, Any] = {"sub": str(subject), "exp": expire, "typ": "refresh", "jti": secrets.token_hex(8)}
+    return jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
+
+
+def create_stream_token(subject: str | int) -> str:
+    """Short-lived token that only opens an event stream; it travels in the URL, so it may end up in logs."""
+    expire = datetime.now(timezone.utc) + timedelta(seconds=settings.event_stream_token_seconds)
+    to_encode: dict[str, Any] = {"sub": str(subject), "exp": expire, "typ": "stream", "jti": secrets.token_hex(8)}
     return jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
 
 
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
 def decode_token(token: str) -> dict[str, Any]:
     try:
         return jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
@@ -0,0 +1,84 @@
+"""Row-to-JSON helpers for the hot read endpoints.
+
+These build plain dicts straight from ORM rows and render them with orjson,
+skipping per-row pydantic validation and FastAPI's response_model pass. The
+shapes must stay identical to the corresponding models in ``app.schemas``.
+"""
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import orjson
+from fastapi.responses import JSONResponse
+
+from app.images import variant_urls
+from app.models import DailyCheckin, Habit
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def habit_to_dict(habit: Habit) -> dict:
+    # schemas.HabitRead
+    return {
+        "id": habit.id,
+        "name": habit.name,
+        "type": habit.type,
+        "is_active": habit.is_active,
+        "order_index": habit.order_index,
+    }
+
+
+def checkin_to_dict(checkin: DailyCheckin) -> dict:
+    # schemas.CheckinRead
+    variants = variant_urls(checkin.image_path)
+    return {
+        "id": checkin.id,
+        "habit_id": checkin.habit_id,
+        "user_id": checkin.user_id,
+        "date": checkin.date,
+        "value_bool": checkin.value_bool,
+        "value_number": checkin.value_number,
+        "value_text": checkin.value_text,
+        "value_time": checkin.value_time,
+        "note": checkin.note,
+        "image_url": checkin.image_path,
+        "thumbnail_url": variants["thumb"],
+        "preview_url": variants["preview"],
+    }
+
+
+def compact_feed_to_dict(
+    checkins: list[DailyCheckin], habits: dict[int, Habit], next_cursor: Optional[str]
+) -> dict:
+    """schemas.CompactFeedResponse: habits listed once, items referencing them by id.
+
+    Items carry the check-in fields only (date, user_id and habit_id are already
+    among them) with null fields omitted.
+    """
+    referenced: dict[int, dict] = {}
+    items = []
+    for ci in checkins:
+        if ci.habit_id not in referenced and ci.habit_id in habits:
+            referenced[ci.habit_id] = habit_to_dict(habits[ci.habit_id])
+        items.append({key: value for key, value in checkin_to_dict(ci).items() if value is not None})
+    return {"format": "compact", "habits": list(referenced.values()), "items": items, "next_cursor": next_cursor}
+
+
+def feed_to_dict(checkins: list[DailyCheckin], habits: dict[int, Habit], next_cursor: Optional[str]) -> dict:
+    # schemas.FeedResponse; each habit is converted once however often it repeats
+    habit_dicts = {habit_id: habit_to_dict(habit) for habit_id, habit in habits.items()}
+    return {
+        "items": [
+            {
+                "date": ci.date,
+                "habit": habit_dicts.get(ci.habit_id),
+                "user_id": ci.user_id,
+                "checkin": checkin_to_dict(ci),
+            }
+            for ci in checkins
+        ],
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Callable, Optional
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Content-addressed uploads and their variants: <sha256>.<ext>[.<variant>.<ext>]
+_CONTENT_ADDRESSED = re.compile(r"(?:^|/)uploads/.+/(?P<name>[0-9a-f]{64}(?:\.[\w.]+)?)$")
+# Top-level segments that belong to the server, never to client-side routes
+_NO_SPA_FALLBACK = frozenset({"api", "static"})
+# Preferred first; the suffix of the precompressed sibling file
+_PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+def content_addressed_etag(rel_path: str) -> Optional[str]:
+    match = _CONTENT_ADDRESSED.search(rel_path)
+    return f'"{match.group("name")}"' if match else None
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        if token.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with explicit caching policy.
+
+    - ``is_immutable(rel_path)`` files are served with a year-long immutable
+      Cache-Control; everything else must revalidate (ETag / 304).
+    - Content-addressed uploads get a strong ETag derived from their hash.
+    - With ``precompressed``, a ``.br`` / ``.gz`` sibling is served when the
+      client accepts that encoding.
+    - With ``spa_fallback`` (implies ``html``), unknown extension-less paths
+      serve ``index.html`` for client-side routing, except under ``api/`` and
+      ``static/``, where clients expect a JSON 404.
+    """
+
+    def __init__(
+        self,
+        *,
+        directory: str | os.PathLike,
+        is_immutable: Callable[[str], bool] = lambda rel_path: False,
+        precompressed: bool = False,
+        spa_fallback: bool = False,
+    ) -> None:
+        super().__init__(directory=directory, html=spa_fallback)
+        self.is_immutable = is_immutable
+        self.precompressed = precompressed
+        self.spa_fallback = spa_fallback
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as exc:
+            if exc.status_code != 404 or not self.spa_fallback or Path(path).suffix:
+                raise
+            if path.lstrip("/").split("/", 1)[0] in _NO_SPA_FALLBACK:
+                raise
+            return await super().get_response("index.html", scope)
+
+    def file_response(
+        self,
+        full_path: str | os.PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        rel_path = Path(os.path.relpath(full_path, self.directory)).as_posix()
+
+        response = None
+        if self.precompressed:
+            response = self._precompressed_response(str(full_path), request_headers, status_code)
+        if response is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+        etag = content_addressed_etag(rel_path)
+        if etag and "content-encoding" not in response.headers:
+            response.headers["etag"] = etag
+        if self.precompressed:
+            response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = (
+            IMMUTABLE_CACHE_CONTROL if self.is_immutable(rel_path) else REVALIDATE_CACHE_CONTROL
+        )
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def _precompressed_response(self, full_path: str, request_headers: Headers, status_code: int) -> Optional[Response]:
+        accept_encoding = request_headers.get("accept-encoding", "")
+        for coding, suffix in _PRECOMPRESSED:
+            if not _accepts(accept_encoding, coding):
+                continue
+            try:
+                stat_result = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+            return FileResponse(
+                full_path + suffix,
+                status_code=status_code,
+                stat_result=stat_result,
+                media_type=media_type,
+                headers={"content-encoding": coding},
+            )
+        return None
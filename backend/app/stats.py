@@ -0,0 +1,306 @@
+"""Incrementally maintained streak and completion statistics (``habit_stats``).
+
+crud.upsert_checkin_rows folds every written check-in into its
+(habit, user) row in the same transaction, so reading the statistics of a
+pair costs one row per habit and member, whatever the length of its history.
+A write that cannot be folded in from the stored row alone (un-completing a
+day, editing a day older than the recent-days window, or the first write for
+a key) recomputes that single key from its check-ins instead.
+
+Rebuild every row from history, e.g. after restoring a backup:
+
+    python -m app.stats [--pair-id N]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import calendar
+from datetime import date
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import dialect_insert
+from app.models import DailyCheckin, Habit, HabitStats
+
+
+# Days tracked in HabitStats.recent_days; keeps the bitmap inside a signed 64-bit integer
+WINDOW_DAYS = 62
+_WINDOW_MASK = (1 << WINDOW_DAYS) - 1
+
+_VALUE_COLUMNS = (
+    DailyCheckin.value_bool,
+    DailyCheckin.value_number,
+    DailyCheckin.value_text,
+    DailyCheckin.value_time,
+)
+
+
+def is_completed(value_bool, value_number, value_text, value_time) -> bool:
+    """A boolean habit counts when checked; the other types when a value was entered."""
+    if value_bool is not None:
+        return value_bool
+    return value_number is not None or bool(value_text) or bool(value_time)
+
+
+def stats_from_days(days: List[date]) -> dict:
+    """HabitStats column values for the sorted, distinct completed ``days``."""
+    longest = run = 0
+    previous = None
+    for day in days:
+        run = run + 1 if previous is not None and (day - previous).days == 1 else 1
+        longest = max(longest, run)
+        previous = day
+    last = days[-1] if days else None
+    recent = 0
+    for day in reversed(days):
+        offset = (last - day).days
+        if offset >= WINDOW_DAYS:
+            break
+        recent |= 1 << offset
+    return {
+        "last_completed": last,
+        "recent_days": recent,
+        "current_run": run,
+        "longest_streak": longest,
+        "total_completed": len(days),
+    }
+
+
+def _apply(stats: HabitStats, day: date, completed: bool) -> bool:
+    """Fold one day's completion into ``stats``; False if the full history is needed."""
+    if stats.last_completed is None:
+        if completed:
+            stats.last_completed = day
+            stats.recent_days = 1
+            stats.current_run = stats.longest_streak = stats.total_completed = 1
+        return True
+
+    offset = (stats.last_completed - day).days
+    if offset < 0:
+        # A new latest completion: slide the window forward
+        if completed:
+            stats.recent_days = ((stats.recent_days << -offset) & _WINDOW_MASK) | 1
+            stats.current_run = stats.current_run + 1 if offset == -1 else 1
+            stats.longest_streak = max(stats.longest_streak, stats.current_run)
+            stats.total_completed += 1
+            stats.last_completed = day
+        return True
+    if offset >= WINDOW_DAYS:
+        return False
+
+    was_completed = bool(stats.recent_days >> offset & 1)
+    if was_completed == completed:
+        return True
+    if not completed:
+        # May shorten the longest streak or move last_completed back; neither is known locally
+        return False
+
+    stats.recent_days |= 1 << offset
+    stats.total_completed += 1
+    # The run the filled-in day belongs to
+    low = high = offset
+    while low > 0 and stats.recent_days >> (low - 1) & 1:
+        low -= 1
+    while high < WINDOW_DAYS - 1 and stats.recent_days >> (high + 1) & 1:
+        high += 1
+    if high == WINDOW_DAYS - 1:
+        # The run may continue beyond the window
+        return False
+    length = high - low + 1
+    if low == 0:
+        stats.current_run = length
+    stats.longest_streak = max(stats.longest_streak, length)
+    return True
+
+
+async def _completed_days(db: AsyncSession, habit_id: int, user_id: int) -> List[date]:
+    rows = (await db.execute(
+        select(DailyCheckin.date, *_VALUE_COLUMNS)
+        .where(DailyCheckin.habit_id == habit_id, DailyCheckin.user_id == user_id)
+        .order_by(DailyCheckin.date)
+    )).all()
+    return [row[0] for row in rows if is_completed(*row[1:])]
+
+
+async def _recompute(db: AsyncSession, stats: HabitStats) -> None:
+    for key, value in stats_from_days(await _completed_days(db, stats.habit_id, stats.user_id)).items():
+        setattr(stats, key, value)
+
+
+async def apply_checkins(db: AsyncSession, checkins: Iterable[DailyCheckin]) -> None:
+    """Update the stats rows of freshly upserted ``checkins``; the caller commits.
+
+    Missing rows are created first with INSERT ... ON CONFLICT DO NOTHING, so
+    concurrent first writes for a key cannot collide; then every row is
+    locked (SELECT ... FOR UPDATE where supported) so concurrent writers to
+    the same key cannot lose each other's updates.
+    """
+    by_key: dict[tuple[int, int], list[DailyCheckin]] = {}
+    for ci in sorted(checkins, key=lambda ci: (ci.habit_id, ci.user_id, ci.date)):
+        by_key.setdefault((ci.habit_id, ci.user_id), []).append(ci)
+    if not by_key:
+        return
+    insert = dialect_insert(db)(HabitStats).on_conflict_do_nothing(index_elements=["habit_id", "user_id"])
+    created = {
+        (row.habit_id, row.user_id)
+        for row in await db.execute(
+            insert.returning(HabitStats.habit_id, HabitStats.user_id),
+            [
+                {"pair_id": key_checkins[0].pair_id, "habit_id": habit_id, "user_id": user_id}
+                for (habit_id, user_id), key_checkins in by_key.items()
+            ],
+        )
+    }
+    existing = {
+        (row.habit_id, row.user_id): row
+        for row in (await db.execute(
+            select(HabitStats)
+            .where(tuple_(HabitStats.habit_id, HabitStats.user_id).in_(list(by_key)))
+            .with_for_update()
+        )).scalars()
+    }
+
+    for (habit_id, user_id), key_checkins in by_key.items():
+        stats = existing[(habit_id, user_id)]
+        if (habit_id, user_id) in created:
+            # A new row, possibly with history written before the table existed
+            await _recompute(db, stats)
+            continue
+        for ci in key_checkins:
+            completed = is_completed(ci.value_bool, ci.value_number, ci.value_text, ci.value_time)
+            if not _apply(stats, ci.date, completed):
+                await _recompute(db, stats)
+                break
+
+
+def summarize(stats: HabitStats, today: date) -> dict:
+    """Read-side view of one row as of ``today`` (schemas.HabitStatsRead)."""
+    recent, last = stats.recent_days or 0, stats.last_completed
+    if last is None:
+        lag, current = None, 0
+    else:
+        lag = (today - last).days
+        if lag < 0:
+            # Completions dated in the future: count from today backwards
+            recent, lag = recent >> -lag, 0
+        # A streak is still current until a whole day passes without completion
+        current = stats.current_run if lag <= 1 else 0
+
+    def rate(days: int) -> float:
+        if lag is None or lag >= days:
+            return 0.0
+        return round(bin(recent & ((1 << (days - lag)) - 1)).count("1") / days, 4)
+
+    return {
+        "habit_id": stats.habit_id,
+        "user_id": stats.user_id,
+        "current_streak": current,
+        "longest_streak": stats.longest_streak,
+        "total_completed": stats.total_completed,
+        "last_completed": last,
+        "completion_rate_7d": rate(7),
+        "completion_rate_28d": rate(28),
+    }
+
+
+def days_in_year(year: int) -> int:
+    # Not via date(year + 1, 1, 1), which does not exist for date.max.year
+    return 366 if calendar.isleap(year) else 365
+
+
+async def completion_bitsets(
+    db: AsyncSession, habit_id: int, user_ids: List[int], year: int
+) -> dict[int, bytearray]:
+    """Per user, a bitset of the days of ``year`` on which ``habit_id`` was completed.
+
+    Bit ``i`` (byte ``i // 8``, least significant bit first) is day ``i`` of
+    the year, January 1st being 0. Built from one range query over the year.
+    """
+    first = date(year, 1, 1)
+    bitsets = {user_id: bytearray((days_in_year(year) + 7) // 8) for user_id in user_ids}
+    rows = (await db.execute(
+        select(DailyCheckin.user_id, DailyCheckin.date, *_VALUE_COLUMNS).where(
+            DailyCheckin.habit_id == habit_id,
+            DailyCheckin.user_id.in_(user_ids),
+            DailyCheckin.date >= first,
+            DailyCheckin.date <= date(year, 12, 31),
+        )
+    )).all()
+    for row in rows:
+        if is_completed(*row[2:]):
+            index = (row.date - first).days
+            bitsets[row.user_id][index >> 3] |= 1 << (index & 7)
+    return bitsets
+
+
+async def list_pair_stats(db: AsyncSession, pair_id: int) -> List[HabitStats]:
+    # Joined to habits so rows of deleted habits are left out
+    return (await db.execute(
+        select(HabitStats)
+        .join(Habit, Habit.id == HabitStats.habit_id)
+        .where(HabitStats.pair_id == pair_id)
+        .order_by(Habit.order_index, HabitStats.user_id)
+    )).scalars().all()
+
+
+async def rebuild_habit_stats(db: AsyncSession, pair_id: Optional[int] = None, batch_size: int = 1000) -> int:
+    """Recompute every stats row (of one pair, or all) from check-in history; returns rows written.
+
+    History is streamed in (habit, user, date) order, so memory stays bounded
+    by one key's completed days.
+    """
+    clear = delete(HabitStats)
+    history = select(DailyCheckin.pair_id, DailyCheckin.habit_id, DailyCheckin.user_id, DailyCheckin.date, *_VALUE_COLUMNS)
+    if pair_id is not None:
+        clear = clear.where(HabitStats.pair_id == pair_id)
+        history = history.where(DailyCheckin.pair_id == pair_id)
+    await db.execute(clear)
+
+    def stats_row(key: tuple[int, int, int], days: List[date]) -> dict:
+        return {"pair_id": key[0], "habit_id": key[1], "user_id": key[2], **stats_from_days(days)}
+
+    rows: list[dict] = []
+    written = 0
+    current_key, days = None, []
+    result = await db.stream(
+        history.order_by(DailyCheckin.habit_id, DailyCheckin.user_id, DailyCheckin.date).execution_options(
+            yield_per=batch_size
+        )
+    )
+    async for row in result:
+        key = (row.pair_id, row.habit_id, row.user_id)
+        if key != current_key:
+            if current_key is not None:
+                rows.append(stats_row(current_key, days))
+            if len(rows) >= batch_size:
+                await db.execute(insert(HabitStats), rows)
+                written += len(rows)
+                rows = []
+            current_key, days = key, []
+        if is_completed(*row[4:]):
+            days.append(row.date)
+    if current_key is not None:
+        rows.append(stats_row(current_key, days))
+    if rows:
+        await db.execute(insert(HabitStats), rows)
+        written += len(rows)
+    await db.commit()
+    return written
+
+
+async def main() -> None:
+    from app.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild habit_stats from daily_checkins")
+    parser.add_argument("--pair-id", type=int, default=None, help="only this pair (default: all)")
+    args = parser.parse_args()
+    async with SessionLocal() as db:
+        written = await rebuild_habit_stats(db, args.pair_id)
+    print(f"Rebuilt {written} habit_stats rows")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from app.config import settings
+from app.crud import purge_refresh_tokens, purge_tombstones, referenced_image_paths
+from app.database import ReadSessionLocal, SessionLocal
+from app.images import variant_owner
+from app.utils import iter_stale_uploads, static_web_path
+
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodically(interval_seconds: float, job: Callable[[], Awaitable[None]]) -> None:
+    """Run ``job`` every ``interval_seconds`` until cancelled; failures are logged, not raised."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await job()
+        except Exception:
+            logger.exception("Background job %s failed", getattr(job, "__name__", job))
+
+
+async def purge_refresh_tokens_job() -> None:
+    async with SessionLocal() as db:
+        removed = await purge_refresh_tokens(db, settings.refresh_token_purge_batch_size)
+    if removed:
+        logger.info("Purged %d expired or revoked refresh tokens", removed)
+
+
+async def purge_tombstones_job() -> None:
+    cutoff = datetime.utcnow() - timedelta(days=settings.sync_tombstone_retention_days)
+    async with SessionLocal() as db:
+        removed = await purge_tombstones(db, cutoff, settings.sync_tombstone_purge_batch_size)
+    if removed:
+        logger.info("Purged %d sync tombstones", removed)
+
+
+def _unlink_if_stale(paths: list[Path], min_age_seconds: float) -> int:
+    # Re-check the age right before deleting: a dedup hit may have just revived the file
+    cutoff = time.time() - min_age_seconds
+    removed = 0
+    for path in paths:
+        with contextlib.suppress(FileNotFoundError):
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+    return removed
+
+
+async def collect_orphan_uploads_job() -> None:
+    """Delete check-in images (and their variants) that no DailyCheckin.image_path refers to any more."""
+    stale = iter_stale_uploads("checkins", settings.upload_gc_grace_seconds)
+    removed = 0
+    while True:
+        batch = await asyncio.to_thread(lambda: list(islice(stale, settings.upload_gc_batch_size)))
+        if not batch:
+            break
+        # Variants live or die with the original they were derived from
+        owners = {path: static_web_path(variant_owner(path)) for path in batch}
+        async with ReadSessionLocal() as db:
+            referenced = await referenced_image_paths(db, list(set(owners.values())))
+        orphans = [path for path, owner in owners.items() if owner not in referenced]
+        removed += await asyncio.to_thread(_unlink_if_stale, orphans, settings.upload_gc_grace_seconds)
+    if removed:
+        logger.info("Removed %d unreferenced uploads", removed)
+
+
+def start_background_tasks() -> list[asyncio.Task]:
+    return [
+        asyncio.create_task(
+            run_periodically(settings.refresh_token_purge_interval_seconds, purge_refresh_tokens_job)
+        ),
+        asyncio.create_task(run_periodically(settings.upload_gc_interval_seconds, collect_orphan_uploads_job)),
+        asyncio.create_task(
+            run_periodically(settings.sync_tombstone_purge_interval_seconds, purge_tombstones_job)
+        ),
+    ]
+
+
+async def stop_background_tasks(tasks: list[asyncio.Task]) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,11 +1,20 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import contextlib
+import hashlib
+import json
+import os
 import secrets
-from datetime import date
+import time
+from datetime import date, datetime
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional, Tuple
 
-from fastapi import UploadFile
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, UploadFile, status
 
 from app.config import settings
 
@@ -20,14 +29,121 @@ def today_utc() -> date:
     return date.today()
 
 
+def encode_feed_cursor(date_value: date, updated_at: datetime, row_id: int) -> str:
+    raw = json.dumps([date_value.isoformat(), updated_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_feed_cursor(cursor: str) -> Tuple[date, datetime, int]:
+    """Inverse of encode_feed_cursor; raises ValueError on malformed input."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        d, u, i = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return date.fromisoformat(d), datetime.fromisoformat(u), int(i)
+    except Exception as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def pair_etag(pair_id: int, version: int, *variant) -> str:
+    """Weak ETag for a pair-scoped read at ``version``.
+
+    ``variant`` must cover every other input the body depends on (user, day,
+    query parameters).
+    """
+    digest = hashlib.blake2b(repr(variant).encode(), digest_size=8).hexdigest()
+    return f'W/"{pair_id}.{version}.{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Weak comparison, as If-None-Match requires
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+
+
+def encode_sync_token(version: int, since: datetime) -> str:
+    raw = json.dumps([version, since.isoformat()], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_sync_token(token: str) -> Tuple[int, datetime]:
+    """Inverse of encode_sync_token; raises ValueError on malformed input."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        version, since = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return int(version), datetime.fromisoformat(since)
+    except Exception as exc:
+        raise ValueError("Invalid sync token") from exc
+
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def _upload_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds {settings.max_upload_bytes} bytes",
+    )
+
+
+def static_web_path(path: Path) -> str:
+    return f"/static/{path.relative_to(settings.static_dir).as_posix()}"
+
+
 async def save_upload(file: UploadFile, subdir: str) -> str:
-    ext = Path(file.filename or "").suffix
-    filename = f"{secrets.token_hex(8)}{ext}"
-    dest_dir = settings.static_dir / "uploads" / subdir
-    dest_dir.mkdir(parents=True, exist_ok=True)
-    dest_path = dest_dir / filename
-    content = await file.read()
-    dest_path.write_bytes(content)
-    # return web path
-    rel_path = dest_path.relative_to(settings.static_dir)
-    return f"/static/{rel_path.as_posix()}"
+    """Stream ``file`` into the content-addressed upload store, enforcing MAX_UPLOAD_BYTES.
+
+    Files are named by the SHA-256 of their bytes (sharded by the first two
+    hex digits), so identical uploads are stored once. Data goes to a
+    temporary ``.part`` file that is renamed into place only once complete.
+
+    Starlette has received the whole request body before a handler runs, so
+    this rejects an oversized file only after it has been uploaded; the
+    bodies themselves are cut off while they arrive by BodySizeLimitMiddleware
+    (MAX_REQUEST_BYTES).
+    """
+    if file.size is not None and file.size > settings.max_upload_bytes:
+        raise _upload_too_large()
+
+    upload_dir = settings.static_dir / "uploads" / subdir
+    await aiofiles.os.makedirs(upload_dir, exist_ok=True)
+    tmp_path = upload_dir / f".{secrets.token_hex(8)}.part"
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > settings.max_upload_bytes:
+                    raise _upload_too_large()
+                digest.update(chunk)
+                await out.write(chunk)
+
+        content_hash = digest.hexdigest()
+        dest_dir = upload_dir / content_hash[:2]
+        dest_path = dest_dir / f"{content_hash}{Path(file.filename or '').suffix.lower()}"
+        await aiofiles.os.makedirs(dest_dir, exist_ok=True)
+        if await aiofiles.os.path.exists(dest_path):
+            # Already stored: refresh mtime so the orphan GC grace period restarts
+            await aiofiles.os.remove(tmp_path)
+            await asyncio.to_thread(os.utime, dest_path)
+        else:
+            await aiofiles.os.replace(tmp_path, dest_path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            await aiofiles.os.remove(tmp_path)
+        raise
+    return static_web_path(dest_path)
+
+
+def iter_stale_uploads(subdir: str, min_age_seconds: float) -> Iterator[Path]:
+    """Files under ``uploads/<subdir>`` not modified for ``min_age_seconds`` (blocking; run in a thread)."""
+    cutoff = time.time() - min_age_seconds
+    for root, _dirs, files in os.walk(settings.static_dir / "uploads" / subdir):
+        for name in files:
+            path = Path(root) / name
+            with contextlib.suppress(FileNotFoundError):
+                if path.stat().st_mtime < cutoff:
+                    yield path
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import date
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.crud import checkin_row, upsert_checkin, upsert_checkin_rows
+from app.database import SessionLocal
+from app.models import DailyCheckin
+
+
+logger = logging.getLogger(__name__)
+
+
+def _row_key(row: dict) -> tuple:
+    return row["user_id"], row["habit_id"], row["date"]
+
+
+class CheckinWriteCoalescer:
+    """Group-commit writer for check-in upserts.
+
+    Concurrent submissions are collected for up to ``max_delay`` seconds or
+    ``max_batch`` rows and written with one multi-row upsert and one commit;
+    each caller's future resolves to its own row. ``None`` in the queue asks
+    the worker to write what it holds and exit.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession], max_batch: int, max_delay: float) -> None:
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: asyncio.Queue[Optional[tuple[dict, asyncio.Future]]] = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        # Not cancelled: a batch being collected or written would lose its callers' futures
+        await self._queue.put(None)
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        # Submissions that raced in behind the sentinel
+        pending = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                pending.append(item)
+        if pending:
+            await self._flush(pending)
+
+    async def submit(self, row: dict) -> DailyCheckin:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stopping = False
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        # A statement may touch each conflict key once; the latest submission wins
+        rows = {_row_key(row): row for row, _ in batch}
+        try:
+            async with self.session_factory() as db:
+                checkins = await upsert_checkin_rows(db, list(rows.values()))
+            by_key = {(ci.user_id, ci.habit_id, ci.date): ci for ci in checkins}
+            for row, future in batch:
+                if not future.done():
+                    future.set_result(by_key[_row_key(row)])
+        except Exception:
+            logger.exception("Group commit of %d check-ins failed; retrying individually", len(rows))
+            await self._flush_individually(batch)
+
+    async def _flush_individually(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        for row, future in batch:
+            if future.done():
+                continue
+            try:
+                async with self.session_factory() as db:
+                    checkins = await upsert_checkin_rows(db, [row])
+                future.set_result(checkins[0])
+            except Exception as exc:
+                future.set_exception(exc)
+
+
+checkin_writer = CheckinWriteCoalescer(
+    SessionLocal,
+    max_batch=settings.checkin_write_batch_size,
+    max_delay=settings.checkin_write_max_delay_ms / 1000,
+)
+
+
+async def write_checkin(
+    db: AsyncSession, pair_id: int, user_id: int, habit_id: int, date_value: date, values: dict
+) -> DailyCheckin:
+    """Upsert one check-in through the coalescer when it is enabled, directly otherwise."""
+    if checkin_writer.running:
+        return await checkin_writer.submit(checkin_row(pair_id, user_id, habit_id, date_value, values))
+    return await upsert_checkin(db, pair_id, user_id, habit_id, date_value, values)
@@ -0,0 +1,10 @@
+"""Benchmarks; run modules from the backend directory, e.g. ``python -m benchmarks.sqlite_concurrency``."""
+
+# Shared by benchmarks.seed and benchmarks.load. Kept here so that the load
+# driver can read them without importing app (which reads DATABASE_URL on import).
+DEFAULT_DATABASE_URL = "sqlite:///./data/bench.db"
+BENCH_PASSWORD = "bench-password"
+
+
+def bench_email(user_id: int) -> str:
+    return f"bench{user_id}@example.com"
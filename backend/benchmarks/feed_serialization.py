@@ -0,0 +1,102 @@
+"""Feed serialization: pydantic models + response_model vs direct dicts + orjson.
+
+    python -m benchmarks.feed_serialization --items 5000 --rounds 20
+
+Rows are built in memory, so only the serialization cost is measured. The
+two payloads are checked to be identical before timing.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import date, datetime, timedelta
+
+import orjson
+
+from app import schemas
+from app.models import DailyCheckin, Habit
+from app.serializers import feed_to_dict
+
+
+def _rows(items: int, habits: int) -> tuple[list[DailyCheckin], dict[int, Habit]]:
+    habit_map = {
+        i: Habit(id=i, pair_id=1, name=f"habit {i}", type="number", is_active=True, order_index=i)
+        for i in range(1, habits + 1)
+    }
+    start = date(2024, 1, 1)
+    checkins = [
+        DailyCheckin(
+            id=i,
+            pair_id=1,
+            user_id=1 + i % 2,
+            habit_id=1 + i % habits,
+            date=start + timedelta(days=i // (2 * habits)),
+            value_number=float(i),
+            note="note" if i % 3 == 0 else None,
+            image_path=None,
+            updated_at=datetime(2024, 1, 1),
+        )
+        for i in range(items)
+    ]
+    return checkins, habit_map
+
+
+def pydantic_path(checkins: list[DailyCheckin], habit_map: dict[int, Habit]) -> bytes:
+    # What feed_overview did before: a model per row, then FastAPI re-validates
+    # the result against response_model and renders it with the stdlib encoder
+    response = schemas.FeedResponse(
+        items=[
+            schemas.FeedItem(
+                date=ci.date,
+                habit=habit_map.get(ci.habit_id),
+                user_id=ci.user_id,
+                checkin=schemas.CheckinRead.model_validate(ci),
+            )
+            for ci in checkins
+        ],
+        next_cursor=None,
+    )
+    validated = schemas.FeedResponse.model_validate(response, from_attributes=True)
+    return json.dumps(validated.model_dump(mode="json"), separators=(",", ":")).encode()
+
+
+def direct_path(checkins: list[DailyCheckin], habit_map: dict[int, Habit]) -> bytes:
+    return orjson.dumps(feed_to_dict(checkins, habit_map, None))
+
+
+def _time(fn, rounds: int, *args) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--habits", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    checkins, habit_map = _rows(args.items, args.habits)
+    assert json.loads(pydantic_path(checkins, habit_map)) == json.loads(direct_path(checkins, habit_map))
+
+    pydantic_s = _time(pydantic_path, args.rounds, checkins, habit_map)
+    direct_s = _time(direct_path, args.rounds, checkins, habit_map)
+    print(
+        json.dumps(
+            {
+                "items": args.items,
+                "pydantic_ms": round(pydantic_s * 1000, 2),
+                "direct_ms": round(direct_s * 1000, 2),
+                "speedup": round(pydantic_s / direct_s, 2),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""Mixed-workload load test of the API: login, today poll, feed and check-in submit.
+
+    python -m benchmarks.seed --pairs 100
+    python -m benchmarks.load --clients 50 --duration 30 --output run.json
+    python -m benchmarks.load --base-url http://127.0.0.1:8000 --clients 50
+    python -m benchmarks.load --baseline run.json
+
+Without --base-url the app runs in-process (ASGI, lifespan included) on
+--database-url; with it, requests go to a running server over HTTP, e.g.
+``uvicorn app.main:app`` started with the same DATABASE_URL. Both expect a
+database filled by benchmarks.seed.
+
+Each client logs in as one seeded user, then sends requests picked at random
+by the weights of --mix until --duration has passed. The today poll sends
+back the ETag it last received, as the web client does, so 304s count as
+successes. Prints a JSON report with overall throughput and, per endpoint,
+request and error counts, status codes and p50/p95/p99 latency in
+milliseconds. With --baseline, the report also gives the change in
+throughput, p95 and p99 against an earlier report.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+
+from benchmarks import BENCH_PASSWORD, DEFAULT_DATABASE_URL, bench_email
+
+
+DEFAULT_MIX = "today=60,feed=20,checkin=15,login=5"
+
+_CHECKIN_VALUES = {
+    "boolean": {"value_bool": "true"},
+    "number": {"value_number": "30"},
+    "time": {"value_time": "07:30"},
+    "text": {"value_text": "done"},
+}
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in Client.OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}; expected one of {', '.join(Client.OPERATIONS)}")
+        weights[name] = int(weight)
+    return weights
+
+
+def percentile(sorted_values: list[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.statuses: dict[str, dict[str, int]] = {}
+
+    def record(self, operation: str, seconds: float, status: Optional[int]) -> None:
+        statuses = self.statuses.setdefault(operation, {})
+        key = str(status) if status is not None else "exception"
+        statuses[key] = statuses.get(key, 0) + 1
+        if status is None or status >= 400:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+        else:
+            self.latencies.setdefault(operation, []).append(seconds)
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for operation in sorted(self.statuses):
+            latencies = sorted(self.latencies.get(operation, []))
+            errors = self.errors.get(operation, 0)
+
+            def ms(q: float) -> Optional[float]:
+                value = percentile(latencies, q)
+                return round(value * 1000, 2) if value is not None else None
+
+            endpoints[operation] = {
+                "requests": len(latencies) + errors,
+                "errors": errors,
+                "statuses": dict(sorted(self.statuses[operation].items())),
+                "rps": round(len(latencies) / elapsed, 1),
+                "p50_ms": ms(0.50),
+                "p95_ms": ms(0.95),
+                "p99_ms": ms(0.99),
+                "max_ms": round(latencies[-1] * 1000, 2) if latencies else None,
+            }
+        succeeded = sum(len(values) for values in self.latencies.values())
+        return {
+            "requests": succeeded + sum(self.errors.values()),
+            "errors": sum(self.errors.values()),
+            "rps": round(succeeded / elapsed, 1),
+            "endpoints": endpoints,
+        }
+
+
+class Client:
+    """One simulated user; each operation returns the response status."""
+
+    OPERATIONS = ("login", "today", "feed", "checkin")
+
+    def __init__(self, http, user_id: int, rng: random.Random) -> None:
+        self.http = http
+        self.user_id = user_id
+        self.rng = rng
+        self.headers: dict[str, str] = {}
+        self.habits: list[dict] = []
+        self.today_etag: Optional[str] = None
+
+    async def setup(self) -> None:
+        if await self.login() != 200:
+            raise SystemExit(f"Could not log in as {bench_email(self.user_id)}; seed the database with benchmarks.seed")
+        response = await self.http.get("/api/v1/habits/", headers=self.headers)
+        response.raise_for_status()
+        self.habits = [habit for habit in response.json() if habit["is_active"]]
+
+    async def login(self) -> int:
+        response = await self.http.post(
+            "/api/v1/auth/login", json={"email": bench_email(self.user_id), "password": BENCH_PASSWORD}
+        )
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return response.status_code
+
+    async def today(self) -> int:
+        headers = dict(self.headers)
+        if self.today_etag:
+            headers["If-None-Match"] = self.today_etag
+        response = await self.http.get("/api/v1/overview/today", headers=headers)
+        self.today_etag = response.headers.get("etag", self.today_etag)
+        return response.status_code
+
+    async def feed(self) -> int:
+        response = await self.http.get("/api/v1/overview/feed", params={"days": 7, "limit": 50}, headers=self.headers)
+        return response.status_code
+
+    async def checkin(self) -> int:
+        habit = self.rng.choice(self.habits)
+        response = await self.http.post(
+            f"/api/v1/checkins/{habit['id']}", data=_CHECKIN_VALUES[habit["type"]], headers=self.headers
+        )
+        return response.status_code
+
+
+async def _run_client(
+    client: Client, weights: dict[str, int], deadline: float, think: float, recorder: Recorder
+) -> None:
+    operations, operation_weights = list(weights), list(weights.values())
+    while time.perf_counter() < deadline:
+        operation = client.rng.choices(operations, weights=operation_weights)[0]
+        started = time.perf_counter()
+        try:
+            status = await getattr(client, operation)()
+        except Exception:
+            status = None
+        recorder.record(operation, time.perf_counter() - started, status)
+        if think:
+            await asyncio.sleep(think)
+
+
+@asynccontextmanager
+async def _http_client(base_url: Optional[str], database_url: str, clients: int) -> AsyncIterator:
+    try:
+        import httpx
+    except ImportError as exc:
+        raise RuntimeError("benchmarks.load requires the 'httpx' package") from exc
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    if base_url:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as http:
+            yield http
+        return
+    # app.config reads DATABASE_URL on import, so it has to be set first
+    os.environ["DATABASE_URL"] = database_url
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits, timeout=30) as http:
+            yield http
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """Relative change per endpoint: positive rps is faster, positive p95 is slower."""
+
+    def change(new: Optional[float], old: Optional[float]) -> Optional[float]:
+        if new is None or not old:
+            return None
+        return round((new - old) / old * 100, 1)
+
+    endpoints = {}
+    for operation, stats in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(operation)
+        if before is None:
+            continue
+        endpoints[operation] = {
+            "rps_change_pct": change(stats["rps"], before["rps"]),
+            "p95_change_pct": change(stats["p95_ms"], before["p95_ms"]),
+            "p99_change_pct": change(stats["p99_ms"], before["p99_ms"]),
+        }
+    return {
+        "started_at": baseline.get("started_at"),
+        "rps_change_pct": change(report["rps"], baseline.get("rps")),
+        "endpoints": endpoints,
+    }
+
+
+async def run(
+    base_url: Optional[str],
+    database_url: str,
+    clients: int,
+    users: int,
+    duration: float,
+    weights: dict[str, int],
+    think: float = 0.0,
+    random_seed: int = 0,
+) -> dict:
+    recorder = Recorder()
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    async with _http_client(base_url, database_url, clients) as http:
+        simulated = [Client(http, i % users + 1, random.Random(random_seed + i)) for i in range(clients)]
+        # Setup logins are not measured
+        await asyncio.gather(*(client.setup() for client in simulated))
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(_run_client(client, weights, deadline, think, recorder) for client in simulated))
+        elapsed = time.perf_counter() - started
+    return {
+        "started_at": started_at,
+        "target": base_url or "in-process",
+        "config": {
+            "database_url": database_url if not base_url else None,
+            "clients": clients,
+            "users": users,
+            "duration_s": duration,
+            "think_ms": think * 1000,
+            "mix": weights,
+        },
+        "elapsed_s": round(elapsed, 3),
+        **recorder.report(elapsed),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=None, help="running server, e.g. http://127.0.0.1:8000 (default: in-process)")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL, help="database of the in-process app")
+    parser.add_argument("--clients", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--users", type=int, default=200, help="seeded users to log in as (2 per seeded pair)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation weights")
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between a client's requests")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--baseline", default=None, help="earlier report to compare against")
+    parser.add_argument("--output", default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = await run(
+        args.base_url,
+        args.database_url,
+        args.clients,
+        args.users,
+        args.duration,
+        parse_mix(args.mix),
+        args.think_ms / 1000,
+        args.seed,
+    )
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["baseline"] = compare(report, json.load(f))
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(encoded + "\n")
+    print(encoded)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
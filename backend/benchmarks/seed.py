@@ -0,0 +1,193 @@
+"""Fill an empty database with synthetic pairs, habits and check-in history.
+
+    python -m benchmarks.seed --pairs 100 --habits 5 --days 365
+    python -m benchmarks.seed --database-url postgresql://... --pairs 1000
+
+Each pair has two members (user ids 2p-1 and 2p, emails from
+benchmarks.bench_email, password benchmarks.BENCH_PASSWORD) and ``--habits``
+habits of mixed types. Every member gets ``--days`` days of check-ins ending
+today, each day completed with probability ``--completion``. Rows are
+written with Core executemany inserts of ``--batch-size`` rows, then
+habit_stats is rebuilt from them. Prints a JSON summary.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator
+
+from sqlalchemy import func, insert, make_url, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.database import Base, add_missing_columns, build_engines, create_missing_indexes
+from app.models import DailyCheckin, Habit, Pair, PairMember, User
+from app.security import password_context
+from app.stats import rebuild_habit_stats
+from app.utils import today_utc
+from benchmarks import BENCH_PASSWORD, DEFAULT_DATABASE_URL, bench_email
+
+
+HABIT_TYPES = ("boolean", "boolean", "number", "time", "text")
+
+
+def _checkin_values(habit_type: str, rng: random.Random) -> dict:
+    values = {"value_bool": None, "value_number": None, "value_text": None, "value_time": None}
+    if habit_type == "boolean":
+        values["value_bool"] = True
+    elif habit_type == "number":
+        values["value_number"] = rng.randint(1, 120)
+    elif habit_type == "time":
+        values["value_time"] = f"{rng.randint(5, 9):02d}:{rng.randint(0, 59):02d}"
+    else:
+        values["value_text"] = rng.choice(("done", "read a chapter", "went for a walk"))
+    return values
+
+
+def _checkin_rows(
+    pairs: int, habits: int, days: int, completion: float, rng: random.Random
+) -> Iterator[dict]:
+    today = today_utc()
+    now = datetime.utcnow()
+    for pair_id in range(1, pairs + 1):
+        for user_id in (2 * pair_id - 1, 2 * pair_id):
+            for h in range(habits):
+                habit_id = (pair_id - 1) * habits + h + 1
+                habit_type = HABIT_TYPES[h % len(HABIT_TYPES)]
+                for offset in range(days - 1, -1, -1):
+                    if rng.random() >= completion:
+                        continue
+                    yield {
+                        "pair_id": pair_id,
+                        "user_id": user_id,
+                        "habit_id": habit_id,
+                        "date": today - timedelta(days=offset),
+                        **_checkin_values(habit_type, rng),
+                        "note": "synthetic" if rng.random() < 0.1 else None,
+                        "image_path": None,
+                        "updated_at": now,
+                    }
+
+
+async def _insert_batched(db: AsyncSession, model, rows: Iterator[dict], batch_size: int) -> int:
+    # Against the Table, not the mapped class: plain Core executemany without ORM bulk bookkeeping
+    written = 0
+    batch: list[dict] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            await db.execute(insert(model.__table__), batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        await db.execute(insert(model.__table__), batch)
+        written += len(batch)
+    return written
+
+
+async def _advance_sequences(db: AsyncSession) -> None:
+    # Ids were given explicitly; later inserts through the app must not reuse them
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for model in (User, Pair, PairMember, Habit):
+        table = model.__tablename__
+        await db.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"))
+
+
+async def seed(
+    database_url: str,
+    pairs: int,
+    habits: int,
+    days: int,
+    completion: float = 0.7,
+    batch_size: int = 10000,
+    random_seed: int = 0,
+) -> dict:
+    rng = random.Random(random_seed)
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        Path(url.database).parent.mkdir(parents=True, exist_ok=True)
+    write_engine, read_engine = build_engines(database_url)
+    session_factory = async_sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
+    async with write_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        await conn.run_sync(create_missing_indexes)
+
+    started = time.perf_counter()
+    async with session_factory() as db:
+        if await db.scalar(select(func.count()).select_from(User)):
+            raise SystemExit(f"{database_url} already has users; seed an empty database")
+        # Every member shares one password, so it is hashed once
+        hashed_password = password_context.hash(BENCH_PASSWORD)
+        users = 2 * pairs
+        await _insert_batched(
+            db,
+            User,
+            ({"id": i, "email": bench_email(i), "hashed_password": hashed_password, "display_name": f"Bench {i}"}
+             for i in range(1, users + 1)),
+            batch_size,
+        )
+        await _insert_batched(db, Pair, ({"id": p, "code": f"B{p:07d}"} for p in range(1, pairs + 1)), batch_size)
+        await _insert_batched(
+            db, PairMember, ({"pair_id": (i + 1) // 2, "user_id": i} for i in range(1, users + 1)), batch_size
+        )
+        await _insert_batched(
+            db,
+            Habit,
+            ({
+                "id": (p - 1) * habits + h + 1,
+                "pair_id": p,
+                "name": f"Habit {h + 1}",
+                "type": HABIT_TYPES[h % len(HABIT_TYPES)],
+                "order_index": h,
+             } for p in range(1, pairs + 1) for h in range(habits)),
+            batch_size,
+        )
+        checkins = await _insert_batched(
+            db, DailyCheckin, _checkin_rows(pairs, habits, days, completion, rng), batch_size
+        )
+        await _advance_sequences(db)
+        await db.commit()
+        inserted = time.perf_counter() - started
+        stats_rows = await rebuild_habit_stats(db)
+
+    elapsed = time.perf_counter() - started
+    await write_engine.dispose()
+    if read_engine is not write_engine:
+        await read_engine.dispose()
+    return {
+        "database_url": database_url,
+        "users": 2 * pairs,
+        "pairs": pairs,
+        "habits": pairs * habits,
+        "checkins": checkins,
+        "habit_stats": stats_rows,
+        "insert_s": round(inserted, 3),
+        "checkins_per_s": round(checkins / inserted, 1) if inserted else None,
+        "elapsed_s": round(elapsed, 3),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--pairs", type=int, default=100)
+    parser.add_argument("--habits", type=int, default=5, help="habits per pair")
+    parser.add_argument("--days", type=int, default=365, help="days of history per member")
+    parser.add_argument("--completion", type=float, default=0.7, help="probability that a day is checked in")
+    parser.add_argument("--batch-size", type=int, default=10000, help="rows per executemany")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+    result = await seed(
+        args.database_url, args.pairs, args.habits, args.days, args.completion, args.batch_size, args.seed
+    )
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
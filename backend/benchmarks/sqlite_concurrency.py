@@ -0,0 +1,117 @@
+"""Concurrent check-in writes and reads against one SQLite file, with and without the storage profile.
+
+    python -m benchmarks.sqlite_concurrency --writers 32 --writes 20 --readers 8
+
+Prints one JSON object per profile with throughput and the number of
+failed operations (typically "database is locked").
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app import crud
+from app.database import Base, build_engines
+from app.models import Habit, Pair, PairMember, User
+
+
+async def _seed(session_factory, users: int, habits: int) -> None:
+    async with session_factory() as db:
+        await db.execute(insert(Pair), [{"id": 1, "code": "BENCH001"}])
+        await db.execute(
+            insert(User), [{"id": i, "email": f"u{i}@bench.local", "hashed_password": "x"} for i in range(1, users + 1)]
+        )
+        await db.execute(insert(PairMember), [{"pair_id": 1, "user_id": i} for i in range(1, users + 1)])
+        await db.execute(
+            insert(Habit), [{"id": i, "pair_id": 1, "name": f"h{i}", "type": "boolean"} for i in range(1, habits + 1)]
+        )
+        await db.commit()
+
+
+async def run_profile(
+    sqlite_profile: bool, writers: int, writes: int, readers: int, habits: int, read_interval: float
+) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'bench.db'}"
+        write_engine, read_engine = build_engines(url, sqlite_profile=sqlite_profile)
+        write_factory = async_sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
+        read_factory = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+        async with write_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await _seed(write_factory, writers, habits)
+
+        errors = 0
+        reads = 0
+        done = asyncio.Event()
+        start_day = date(2024, 1, 1)
+
+        async def writer(user_id: int) -> None:
+            nonlocal errors
+            for i in range(writes):
+                try:
+                    async with write_factory() as db:
+                        await crud.upsert_checkin(
+                            db, 1, user_id, i % habits + 1, start_day + timedelta(days=i // habits), {"value_bool": True}
+                        )
+                except Exception:
+                    errors += 1
+
+        async def reader() -> None:
+            nonlocal errors, reads
+            while not done.is_set():
+                try:
+                    async with read_factory() as db:
+                        await crud.list_checkins_for_date(db, 1, start_day)
+                    reads += 1
+                except Exception:
+                    errors += 1
+                # Readers model polling clients rather than a closed loop hogging the event loop
+                await asyncio.sleep(read_interval)
+
+        reader_tasks = [asyncio.create_task(reader()) for _ in range(readers)]
+        started = time.perf_counter()
+        await asyncio.gather(*(writer(uid) for uid in range(1, writers + 1)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await asyncio.gather(*reader_tasks)
+
+        await write_engine.dispose()
+        if read_engine is not write_engine:
+            await read_engine.dispose()
+
+    total_writes = writers * writes
+    return {
+        "profile": "sqlite_production" if sqlite_profile else "default",
+        "writes": total_writes,
+        "failed_ops": errors,
+        "elapsed_s": round(elapsed, 3),
+        "writes_per_s": round((total_writes - errors) / elapsed, 1),
+        "reads_per_s": round(reads / elapsed, 1),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--writes", type=int, default=20, help="upserts per writer")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--habits", type=int, default=10)
+    parser.add_argument("--read-interval", type=float, default=0.05, help="pause between reads per reader, seconds")
+    args = parser.parse_args()
+    for profile in (False, True):
+        result = await run_profile(
+            profile, args.writers, args.writes, args.readers, args.habits, args.read_interval
+        )
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import os
+import tempfile
+
+# app.config reads the environment on import, so this has to run before any test imports app
+_tmp = tempfile.mkdtemp(prefix="heartsync-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def register(client):
+    """Register and log in a user; returns their Authorization header."""
+
+    def _register(email: str) -> dict[str, str]:
+        client.post("/api/v1/auth/register", json={"email": email, "password": "pw12345"})
+        response = client.post("/api/v1/auth/login", json={"email": email, "password": "pw12345"})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return _register
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app import database
+from app.response_cache import response_cache
+
+
+@contextmanager
+def count_statements():
+    statements: list[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, *args) -> None:
+        statements.append(statement)
+
+    engines = {database.engine.sync_engine, database.read_engine.sync_engine}
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _today_query_count(client, headers) -> int:
+    with count_statements() as statements:
+        response = client.get("/api/v1/overview/today", headers=headers)
+    assert response.status_code == 200, response.text
+    return len(statements)
+
+
+def test_today_overview_query_count_does_not_grow_with_habits(client, register, monkeypatch):
+    # Every request must build the overview rather than replay a rendered copy
+    monkeypatch.setattr(response_cache, "enabled", False)
+    owner = register("today-owner@example.com")
+    partner = register("today-partner@example.com")
+    code = client.post("/api/v1/pair/create", headers=owner).json()["code"]
+    assert client.post("/api/v1/pair/join", json={"code": code}, headers=partner).status_code == 200
+
+    def add_habits(count: int) -> None:
+        for _ in range(count):
+            index = len(client.get("/api/v1/habits/", headers=owner).json())
+            habit = client.post(
+                "/api/v1/habits/", json={"name": f"habit {index}", "type": "boolean", "order_index": index}, headers=owner
+            ).json()
+            for headers in (owner, partner):
+                response = client.post(f"/api/v1/checkins/{habit['id']}", data={"value_bool": "true"}, headers=headers)
+                assert response.status_code == 200, response.text
+
+    add_habits(1)
+    # Warm the per-user request context cache so both measurements see the same state
+    _today_query_count(client, owner)
+    with_one_habit = _today_query_count(client, owner)
+
+    add_habits(19)
+    response = client.get("/api/v1/overview/today", headers=owner)
+    assert len(response.json()["tasks"]) == 20
+    with_twenty_habits = _today_query_count(client, owner)
+
+    assert with_twenty_habits == with_one_habit
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+from app import crud
+from app.database import SessionLocal
+from app.models import HabitStats
+from app.stats import WINDOW_DAYS, stats_from_days
+
+DAYS = 300
+_STATS_COLUMNS = ("last_completed", "recent_days", "current_run", "longest_streak", "total_completed")
+
+
+async def _random_upserts(emails: list[str], habit_ids: list[int]) -> list:
+    """Random single and batch upserts; every stats row they touch that differs from a full recompute."""
+    rng = random.Random(21)
+    start = date(2024, 1, 1)
+    # (habit_id, user_id) -> day -> completed, as last written
+    completed: dict[tuple[int, int], dict[date, bool]] = {}
+    mismatches = []
+    async with SessionLocal() as db:
+        user_ids = [(await crud.get_user_by_email(db, email)).id for email in emails]
+        pair_id = (await crud.get_user_pairs(db, user_ids[0]))[0].id
+
+        async def upsert(user_id: int, day: date, values_by_habit: dict[int, dict]) -> None:
+            if len(values_by_habit) > 1:
+                await crud.upsert_checkins(db, pair_id, user_id, day, values_by_habit)
+            else:
+                [(habit_id, values)] = values_by_habit.items()
+                await crud.upsert_checkin(db, pair_id, user_id, habit_id, day, values)
+            for habit_id, values in values_by_habit.items():
+                completed.setdefault((habit_id, user_id), {})[day] = values["value_bool"]
+
+            # Checked after every write: a later recompute would hide an earlier drift
+            rows = (await db.execute(
+                select(HabitStats.habit_id, *(getattr(HabitStats, column) for column in _STATS_COLUMNS))
+                .where(HabitStats.user_id == user_id, HabitStats.habit_id.in_(list(values_by_habit)))
+            )).all()
+            for habit_id, *values in rows:
+                actual = dict(zip(_STATS_COLUMNS, values))
+                expected = stats_from_days(sorted(d for d, done in completed[(habit_id, user_id)].items() if done))
+                if actual != expected:
+                    mismatches.append((habit_id, user_id, day, actual, expected))
+
+        for offset in range(DAYS):
+            today = start + timedelta(days=offset)
+            for user_id in user_ids:
+                # The day's check-ins, mostly completed so runs outgrow the window
+                await upsert(user_id, today, {habit_id: {"value_bool": rng.random() < 0.97} for habit_id in habit_ids})
+            for _ in range(rng.randint(0, 2)):
+                user_id, habit_id = rng.choice(user_ids), rng.choice(habit_ids)
+                missed = [
+                    day
+                    for day, done in completed[(habit_id, user_id)].items()
+                    if not done and (today - day).days < WINDOW_DAYS
+                ]
+                roll = rng.random()
+                if missed and roll < 0.5:
+                    # A missed day ticked off late, joining the runs on either side
+                    await upsert(user_id, rng.choice(missed), {habit_id: {"value_bool": True}})
+                else:
+                    # Back-fills and overwrites, mostly inside the window
+                    back = rng.randint(1, WINDOW_DAYS - 1) if roll < 0.9 else rng.randint(WINDOW_DAYS, 200)
+                    await upsert(user_id, today - timedelta(days=back), {habit_id: {"value_bool": rng.random() < 0.7}})
+    return mismatches
+
+
+def test_incremental_stats_match_full_recompute(client, register):
+    emails = ["stats-owner@example.com", "stats-partner@example.com"]
+    owner, partner = (register(email) for email in emails)
+    code = client.post("/api/v1/pair/create", headers=owner).json()["code"]
+    assert client.post("/api/v1/pair/join", json={"code": code}, headers=partner).status_code == 200
+    habit_ids = [
+        client.post(
+            "/api/v1/habits/", json={"name": f"habit {i}", "type": "boolean", "order_index": i}, headers=owner
+        ).json()["id"]
+        for i in range(3)
+    ]
+
+    # In the app's event loop, which owns the pooled connections
+    mismatches = client.portal.call(_random_upserts, emails, habit_ids)
+
+    assert mismatches[:3] == []
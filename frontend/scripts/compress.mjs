@@ -0,0 +1,24 @@
+// Write .br and .gz siblings for the built assets so the backend can serve them precompressed.
+import { readdir, readFile, writeFile } from 'node:fs/promises'
+import { join, extname } from 'node:path'
+import { brotliCompressSync, gzipSync, constants } from 'node:zlib'
+
+const DIST = new URL('../dist/', import.meta.url).pathname
+const COMPRESSIBLE = new Set(['.html', '.js', '.css', '.svg', '.json', '.txt', '.map'])
+const MIN_BYTES = 1024
+
+async function* walk(dir) {
+  for (const entry of await readdir(dir, { withFileTypes: true })) {
+    const path = join(dir, entry.name)
+    if (entry.isDirectory()) yield* walk(path)
+    else yield path
+  }
+}
+
+for await (const file of walk(DIST)) {
+  if (!COMPRESSIBLE.has(extname(file))) continue
+  const data = await readFile(file)
+  if (data.length < MIN_BYTES) continue
+  await writeFile(`${file}.br`, brotliCompressSync(data, { params: { [constants.BROTLI_PARAM_QUALITY]: 11 } }))
+  await writeFile(`${file}.gz`, gzipSync(data, { level: 9 }))
+}
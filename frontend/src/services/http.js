@@ -1,5 +1,5 @@
 import axios from 'axios'
-import { getAccessToken, getRefreshToken, setAccessToken, clearTokens } from './auth'
+import { getAccessToken, getRefreshToken, setAccessToken, setRefreshToken, clearTokens } from './auth'
 
 const api = axios.create({
   baseURL: `${import.meta.env.VITE_API_BASE}/api/v1`,
@@ -35,6 +35,8 @@ api.interceptors.response.use(
         const resp = await axios.post(`${import.meta.env.VITE_API_BASE}/api/v1/auth/refresh`, { refresh_token: rt })
         const newAccess = resp.data.access_token
         setAccessToken(newAccess)
+        // Refresh tokens are rotated on every use
+        if (resp.data.refresh_token) setRefreshToken(resp.data.refresh_token)
         pending.forEach((p) => p.resolve(newAccess))
         pending = []
         original.headers.Authorization = `Bearer ${newAccess}`